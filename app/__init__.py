@@ -1,10 +1,14 @@
 # app/__init__.py
 import logging
+import time
 from flask import Flask
 from dotenv import load_dotenv
 
 
 def create_app():
+	started = time.perf_counter()
+	phases = {}
+
 	load_dotenv()
 	app = Flask(__name__)
 
@@ -15,15 +19,47 @@ def create_app():
 	app.logger.propagate = False  # Prevent Flask-specific propagation
 
 	# Register blueprints
-	from app.routes.waypoints import waypoints_bp
+	phase_start = time.perf_counter()
+	from app.routes.waypoints import waypoints_bp, load_waypoints
 	from app.routes.merges import merges_bp
+	from app.routes.metrics import metrics_bp
 	app.register_blueprint(waypoints_bp, url_prefix='/api')
 	app.register_blueprint(merges_bp)
+	app.register_blueprint(metrics_bp)
+	phases['imports'] = time.perf_counter() - phase_start
+
+	# Load waypoints (and migrate old entries) now rather than at import
+	phase_start = time.perf_counter()
+	waypoint_count = load_waypoints()
+	phases['waypoints'] = time.perf_counter() - phase_start
+
+	# Start one merge worker per world; Amulet is imported lazily on the first merge, or prewarmed here
+	phase_start = time.perf_counter()
+	from app.config import AMULET_PREWARM
+	from app.tasks.background_worker import start_workers
+	from app.utils.amulet_loader import prewarm_amulet
+	start_workers()
+	if AMULET_PREWARM:
+		prewarm_amulet()
+	phases['worker'] = time.perf_counter() - phase_start
 
-	# Start background worker
-	from app.tasks.background_worker import background_worker
-	import threading
-	worker_thread = threading.Thread(target=background_worker, daemon=True)
-	worker_thread.start()
+	phases['total'] = time.perf_counter() - started
+	_report_startup(app, phases, waypoint_count, AMULET_PREWARM)
 
 	return app
+
+
+def _report_startup(app, phases, waypoint_count, amulet_prewarm):
+	from app.utils.metrics import STARTUP_SECONDS
+	for phase, seconds in phases.items():
+		STARTUP_SECONDS.set(round(seconds, 4), phase=phase)
+	app.config['STARTUP_REPORT'] = {
+		'seconds': {phase: round(seconds, 4) for phase, seconds in phases.items()},
+		'waypoints': waypoint_count,
+		'amulet_prewarm': amulet_prewarm,
+	}
+	details = ', '.join(f"{phase} {seconds:.3f}s" for phase, seconds in phases.items() if phase != 'total')
+	app.logger.info(
+		f"App ready in {phases['total']:.3f}s ({details}); {waypoint_count} waypoints loaded, "
+		f"Amulet {'prewarming in background' if amulet_prewarm else 'loads on first merge'}"
+	)
@@ -12,6 +12,13 @@ GUNICORN_ERROR_LOG = os.getenv("GUNICORN_ERROR_LOG", "gunicorn_error.log")
 APP_LOG = os.getenv("APP_LOG", "application.log")
 MAX_LOG_BYTES = int(os.getenv("MAX_LOG_BYTES", "10485760"))
 LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Records buffered between emitters and the log writer thread; overflow is dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# BlueMap output sampling: other lines at most one per BLUEMAP_LOG_INTERVAL seconds
+# after a burst, progress lines at most one per map per BLUEMAP_PROGRESS_LOG_INTERVAL
+BLUEMAP_LOG_INTERVAL = float(os.getenv("BLUEMAP_LOG_INTERVAL", "0.2"))
+BLUEMAP_LOG_BURST = int(os.getenv("BLUEMAP_LOG_BURST", "20"))
+BLUEMAP_PROGRESS_LOG_INTERVAL = float(os.getenv("BLUEMAP_PROGRESS_LOG_INTERVAL", "30"))
 
 # Ensure log directory exists
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -22,6 +29,10 @@ DATA_FILE = os.getenv("DATA_FILE", "waypoints.json")
 # Warp movement threshold
 DISTANCE_THRESHOLD = int(os.getenv("DISTANCE_THRESHOLD", "5"))
 
+# Bulk waypoint ingestion: warps validated per batch, and per-item errors reported back
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "5000"))
+BULK_MAX_ERROR_DETAILS = int(os.getenv("BULK_MAX_ERROR_DETAILS", "100"))
+
 # Default dimension setting
 DEFAULT_DIMENSION = os.getenv("DEFAULT_DIMENSION", "minecraft:overworld")
 
@@ -50,6 +61,42 @@ RCON_PASSWORD = os.getenv("RCON_PASSWORD", "default_password")
 # API configuration
 API_KEY = os.getenv("API_KEY", "your-default-api-key")
 
+# Push-based merge progress (SSE / long-poll)
+PROGRESS_PUBLISH_INTERVAL = float(os.getenv("PROGRESS_PUBLISH_INTERVAL", "0.5"))
+PROGRESS_HEARTBEAT_SECONDS = float(os.getenv("PROGRESS_HEARTBEAT_SECONDS", "15"))
+PROGRESS_STREAM_MAX_SECONDS = float(os.getenv("PROGRESS_STREAM_MAX_SECONDS", "300"))
+PROGRESS_LONG_POLL_MAX_SECONDS = float(os.getenv("PROGRESS_LONG_POLL_MAX_SECONDS", "30"))
+# Each open stream or long-poll holds one of gunicorn's THREADS; at most PROGRESS_MAX_WATCHERS
+# (default half of THREADS) at once, others are told to retry after PROGRESS_RETRY_SECONDS
+PROGRESS_MAX_WATCHERS = int(os.getenv("PROGRESS_MAX_WATCHERS", str(max(1, int(os.getenv("THREADS", "16")) // 2))))
+PROGRESS_RETRY_SECONDS = int(os.getenv("PROGRESS_RETRY_SECONDS", "5"))
+
+# Merge job records (job.json plus per-job artifacts such as profiles)
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "200"))
+# Region snapshots taken before each merge is saved, for rollback; only the newest
+# SNAPSHOT_RETENTION are kept. Rollback waits at most ROLLBACK_LOCK_TIMEOUT for the world lock
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true").lower() == "true"
+SNAPSHOT_RETENTION = int(os.getenv("SNAPSHOT_RETENTION", "10"))
+ROLLBACK_LOCK_TIMEOUT = float(os.getenv("ROLLBACK_LOCK_TIMEOUT", "5"))
+# `python -m app.tasks.compaction` (run with the server stopped) only rewrites a region
+# file without its dead sectors when that frees at least COMPACTION_MIN_RECLAIM_BYTES
+COMPACTION_MIN_RECLAIM_BYTES = int(os.getenv("COMPACTION_MIN_RECLAIM_BYTES", "65536"))
+# Threads inflating / copying uploaded archive members (zip, tar, tar.zst)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Recent successful jobs whose stage rates feed /merge/preview duration estimates
+PREVIEW_HISTORY_JOBS = int(os.getenv("PREVIEW_HISTORY_JOBS", "20"))
+
+# Per-job profiling (cProfile + tracemalloc); PROFILE_ALL_JOBS is the initial admin toggle
+PROFILE_ALL_JOBS = os.getenv("PROFILE_ALL_JOBS", "false").lower() == "true"
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "25"))
+# Seconds between the heap snapshots that sample allocation sites during a profiled job
+PROFILE_SAMPLE_SECONDS = float(os.getenv("PROFILE_SAMPLE_SECONDS", "10"))
+
+# Import Amulet on a background thread at startup instead of on the first merge
+AMULET_PREWARM = os.getenv("AMULET_PREWARM", "true").lower() == "true"
+
 # Local server world directory for Amulet merges
 LOCAL_WORLD_DIR = os.getenv("LOCAL_WORLD_DIR", "local_world")
 
@@ -72,3 +119,11 @@ DIMENSION_TO_WORLD_PATH = {
     "minecraft:the_end": os.getenv("DIMENSION_WORLD_END", "world/DIM1"),
     "pixelmon:ultra_space": os.getenv("DIMENSION_WORLD_ULTRASPACE", "world/dimensions/pixelmon/ultra_space")
 }
+
+# Named merge targets (one per server). WORLDS_FILE is a JSON object of
+# {name: settings}; see app/utils/world_targets.py. Without it there is a single
+# target named DEFAULT_WORLD built from the settings above.
+WORLDS_FILE = os.getenv("WORLDS_FILE", "worlds.json")
+DEFAULT_WORLD = os.getenv("DEFAULT_WORLD", "default")
+# Merges running at once across all worlds; each world still runs one at a time
+MAX_CONCURRENT_MERGES = int(os.getenv("MAX_CONCURRENT_MERGES", "2"))
@@ -1,37 +1,160 @@
 # app/routes/merges.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, send_file
+from filelock import FileLock, Timeout
+import json
 import logging
 import os
+import shutil
 import tempfile
-from app.tasks.background_worker import process_queue, get_current_job, get_pending_jobs
+import threading
+import time
+from app.tasks.background_worker import (
+    enqueue_job,
+    get_current_job,
+    get_pending_jobs,
+    get_queued_job,
+    progress_events,
+    shared_progress_snapshot,
+    profiling_settings,
+)
+from app.tasks.job_records import job_dir, is_valid_job_id, read_job_record, list_job_records
+from app.tasks.snapshots import conflicting_jobs, read_snapshot_manifest, rollback_snapshot, snapshot_summary
+from app.routes.auth import require_api_key
+from app.utils.archive_extract import ArchiveError, check_archive
+from app.utils.merge_preview import preview_merge
+from app.utils.profiling import PROFILE_FILE, PROFILE_SUMMARY_FILE, ALLOCATIONS_FILE
+from app.utils.rcon_helper import server_reachable
+from app.utils.world_targets import WORLD_TARGETS, DEFAULT_WORLD_NAME, get_world_target, world_lock_path
+from app.config import (
+    PREVIEW_HISTORY_JOBS,
+    ROLLBACK_LOCK_TIMEOUT,
+    PROGRESS_HEARTBEAT_SECONDS,
+    PROGRESS_STREAM_MAX_SECONDS,
+    PROGRESS_LONG_POLL_MAX_SECONDS,
+    PROGRESS_MAX_WATCHERS,
+    PROGRESS_RETRY_SECONDS,
+)
 
 merges_bp = Blueprint('merges', __name__)
 logger = logging.getLogger(__name__)
 
+# Open /merge/events streams and /merge/status/wait polls; each one holds a server thread
+progress_watchers = threading.BoundedSemaphore(PROGRESS_MAX_WATCHERS)
+
+# Per-job files that may be downloaded from /merge/jobs/<job_id>/artifacts/<name>
+JOB_ARTIFACTS = {
+    PROFILE_FILE: "application/octet-stream",
+    PROFILE_SUMMARY_FILE: "text/plain",
+    ALLOCATIONS_FILE: "application/json",
+}
+
+def _requested_world():
+    """
+    The world target named by the 'world' query/form field (the default world if
+    absent), or (None, error response) for an unknown name.
+    """
+    name = request.values.get("world") or None
+    target = get_world_target(name)
+    if target is None:
+        return None, (jsonify({"error": f"Unknown world: {name}", "worlds": sorted(WORLD_TARGETS)}), 404)
+    return target, None
+
+@merges_bp.route("/merge/worlds", methods=["GET"])
+def list_worlds():
+    """World targets uploads can be merged into (pass one as 'world' to /merge)."""
+    return jsonify({
+        "default": DEFAULT_WORLD_NAME,
+        "worlds": [target.describe() for target in WORLD_TARGETS.values()],
+    }), 200
+
 @merges_bp.route("/merge", methods=["POST"])
 def merge_worlds():
     if "world_zip" not in request.files:
         logger.warning("Missing 'world_zip' in request")
         return jsonify({"error": "No 'world_zip' file found"}), 400
 
+    # 'world_zip' may hold a .zip, .tar or .tar.zst; the format is detected from its contents
     uploaded_file = request.files["world_zip"]
-    if not uploaded_file.filename.endswith('.zip'):
-        logger.warning(f"Invalid file type: {uploaded_file.filename}")
-        return jsonify({"error": "Uploaded file must be a zip archive."}), 400
+    target, error = _requested_world()
+    if error:
+        return error
 
     temp_dir = tempfile.mkdtemp(prefix="upload_")
     saved_zip_path = os.path.join(temp_dir, uploaded_file.filename)
     uploaded_file.save(saved_zip_path)
+    try:
+        archive_format = check_archive(saved_zip_path)
+    except ArchiveError as e:
+        logger.warning(f"Rejected upload {uploaded_file.filename}: {e}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return jsonify({"error": str(e)}), 400
+
+    # Profile this job with cProfile + tracemalloc (?profile=true or a 'profile' form field)
+    profile = (request.values.get("profile", "false").lower() == "true")
+
+    job_id = enqueue_job(saved_zip_path, profile=profile, world=target.name)
+    logger.info(f"Received {archive_format} archive {uploaded_file.filename}, "
+                f"queued for merge into '{target.name}' as job {job_id}")
 
-    logger.info(f"Received ZIP {uploaded_file.filename}, queued for merge")
-    process_queue.put(saved_zip_path)
+    return jsonify({"status": "ok", "message": "File queued for merging", "job_id": job_id,
+                    "world": target.name, "format": archive_format}), 200
 
-    return jsonify({"status": "ok", "message": "File queued for merging"}), 200
+@merges_bp.route("/merge/preview", methods=["GET", "POST"])
+def merge_preview():
+    """
+    What a merge would touch, from region headers alone: per-dimension region and
+    chunk counts, new vs overwritten chunks, and projected merge/relight/render
+    durations from recent jobs' per-chunk rates (queue wait not included).
+
+    POST an upload as 'world_zip' (it is not queued) with an optional 'world', or GET
+    with ?job_id= of a job still waiting in a queue (compared against its own world).
+    """
+    started = time.perf_counter()
+    temp_dir = None
+    if request.method == "POST":
+        target, error = _requested_world()
+        if error:
+            return error
+        if "world_zip" not in request.files:
+            return jsonify({"error": "No 'world_zip' file found"}), 400
+        uploaded_file = request.files["world_zip"]
+        temp_dir = tempfile.mkdtemp(prefix="preview_")
+        zip_path = os.path.join(temp_dir, "upload")
+        uploaded_file.save(zip_path)
+        source = {"filename": uploaded_file.filename}
+    else:
+        job_id = request.args.get("job_id", "")
+        job = get_queued_job(job_id) if is_valid_job_id(job_id) else None
+        if job is None:
+            return jsonify({"error": "No queued job with that job_id"}), 404
+        target = get_world_target(job["world"])
+        zip_path = job["zip_path"]
+        source = {"job_id": job_id, "filename": os.path.basename(zip_path)}
+
+    try:
+        preview = preview_merge(zip_path, target.local_world_dir, list_job_records(limit=PREVIEW_HISTORY_JOBS))
+    except FileNotFoundError:
+        # The worker picked the job up and removed its ZIP while we were reading it
+        return jsonify({"error": "The job's archive is no longer available"}), 409
+    except ArchiveError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    preview["source"] = source
+    preview["world"] = target.name
+    preview["scan_seconds"] = round(time.perf_counter() - started, 3)
+    return jsonify(preview), 200
 
 @merges_bp.route("/merge/status", methods=["GET"])
 def merge_status():
-    job = get_current_job()
-    pending = get_pending_jobs()
+    """Current job and queue. With ?world=, for that world only; otherwise the default world's job and all queues."""
+    world = request.args.get("world") or None
+    if world is not None and get_world_target(world) is None:
+        return jsonify({"error": f"Unknown world: {world}", "worlds": sorted(WORLD_TARGETS)}), 404
+    job = get_current_job(world)
+    pending = get_pending_jobs(world)
 
     # Only include chunk info if the current stage is 'amulet merge'
     if job and job.get("stage") == "amulet merge":
@@ -45,6 +168,8 @@ def merge_status():
     render_progress = job.get("render_progress") if job and job.get("stage") == "bluemap render" else None
 
     return jsonify({
+        "world": job.get("world") if job else world,
+        "job_id": job.get("job_id") if job else None,
         "current_job": job.get("current_job") if job else None,
         "stage": job.get("stage") if job else None,
         "total_chunks": total_chunks,
@@ -53,3 +178,194 @@ def merge_status():
         "pending_jobs": pending,
         "queue_size": len(pending)
     }), 200
+
+def _progress_delta(previous, current):
+    """Top-level fields of `current` that differ from `previous`."""
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+@merges_bp.route("/merge/events", methods=["GET"])
+def merge_events():
+    """
+    Server-sent events stream of merge progress.
+
+    Sends a full "snapshot" event on connect and on every stage or job change, and
+    "progress" events carrying only the changed fields in between. Comment lines are
+    sent as heartbeats while idle. The stream closes after PROGRESS_STREAM_MAX_SECONDS;
+    EventSource clients reconnect automatically. Follows the default world unless
+    ?world= names another; every event's "worlds" field summarises all of them.
+
+    Every open stream or long-poll holds one server thread, so at most
+    PROGRESS_MAX_WATCHERS (by default half of gunicorn's THREADS) run at once;
+    they share one snapshot per status version. Past the limit the response
+    carries one snapshot and a `retry:` of PROGRESS_RETRY_SECONDS, then closes,
+    so the client reconnects later instead of holding a thread.
+    """
+    target, error = _requested_world()
+    if error:
+        return error
+
+    def stream():
+        previous = shared_progress_snapshot(target.name)
+        version = previous["version"]
+        # Taken here, not before the response, so the generator's finally always releases it
+        if not progress_watchers.acquire(blocking=False):
+            yield f"retry: {PROGRESS_RETRY_SECONDS * 1000}\n"
+            yield f"id: {version}\nevent: snapshot\ndata: {json.dumps(previous)}\n\n"
+            return
+
+        try:
+            deadline = time.monotonic() + PROGRESS_STREAM_MAX_SECONDS
+            yield f"id: {version}\nevent: snapshot\ndata: {json.dumps(previous)}\n\n"
+
+            while time.monotonic() < deadline:
+                new_version = progress_events.wait(version, PROGRESS_HEARTBEAT_SECONDS)
+                if new_version == version:
+                    yield ": keepalive\n\n"
+                    continue
+                version = new_version
+                current = shared_progress_snapshot(target.name)
+                if (current["stage"], current["current_job"]) != (previous["stage"], previous["current_job"]):
+                    yield f"id: {version}\nevent: snapshot\ndata: {json.dumps(current)}\n\n"
+                else:
+                    delta = _progress_delta(previous, current)
+                    yield f"id: {version}\nevent: progress\ndata: {json.dumps(delta)}\n\n"
+                previous = current
+        finally:
+            progress_watchers.release()
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@merges_bp.route("/merge/status/wait", methods=["GET"])
+def merge_status_wait():
+    """
+    Long-poll variant of the progress stream. Blocks until the status version
+    differs from `since` (or `timeout` seconds pass), then returns the full snapshot.
+    Pass the returned "version" back as `since` on the next call. Accepts ?world=
+    like /merge/events. Answers 503 with Retry-After while PROGRESS_MAX_WATCHERS
+    streams and long-polls are already open.
+    """
+    target, error = _requested_world()
+    if error:
+        return error
+    try:
+        since = int(request.args.get("since", "-1"))
+        timeout = float(request.args.get("timeout", str(PROGRESS_LONG_POLL_MAX_SECONDS)))
+    except ValueError:
+        return jsonify({"error": "'since' must be an integer and 'timeout' a number"}), 400
+
+    if not progress_watchers.acquire(blocking=False):
+        response = jsonify({"error": "Too many progress watchers; retry later or poll /merge/status"})
+        response.headers["Retry-After"] = str(PROGRESS_RETRY_SECONDS)
+        return response, 503
+    try:
+        progress_events.wait(since, min(max(timeout, 0), PROGRESS_LONG_POLL_MAX_SECONDS))
+    finally:
+        progress_watchers.release()
+    return jsonify(shared_progress_snapshot(target.name)), 200
+
+@merges_bp.route("/merge/jobs", methods=["GET"])
+def list_jobs():
+    """Most recent finished job records, newest first. Query: limit (default 50)."""
+    try:
+        limit = int(request.args.get("limit", "50"))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    return jsonify(list_job_records(limit=max(limit, 1))), 200
+
+@merges_bp.route("/merge/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    record = read_job_record(job_id) if is_valid_job_id(job_id) else None
+    if record is None:
+        return jsonify({"error": "Unknown job"}), 404
+    record["artifacts"] = [
+        name for name in JOB_ARTIFACTS if os.path.isfile(os.path.join(job_dir(job_id), name))
+    ]
+    manifest = read_snapshot_manifest(job_id)
+    record["snapshot"] = snapshot_summary(manifest) if manifest else None
+    return jsonify(record), 200
+
+@merges_bp.route("/merge/jobs/<job_id>/rollback", methods=["POST"])
+@require_api_key
+def rollback_job(job_id):
+    """
+    Restores the world files a job's save overwrote and removes the ones it created.
+    Refuses (409) if later jobs touched the same regions, unless ?force=true, since
+    their changes to those regions would be lost too. Does not re-render BlueMap.
+
+    Also refuses (409) while the world's server answers on its RCON port: restored
+    files are renamed into place, and a running server keeps writing its loaded
+    chunks through region files it already has open, undoing the rollback. Stop
+    the server first.
+    """
+    manifest = read_snapshot_manifest(job_id) if is_valid_job_id(job_id) else None
+    if manifest is None:
+        return jsonify({"error": "No snapshot retained for this job"}), 404
+    if manifest.get("rolled_back_at"):
+        return jsonify({"error": "Job was already rolled back", "rollback": manifest.get("rollback")}), 409
+
+    force = request.args.get("force", "false").lower() == "true"
+    # Lock the folder the snapshot was taken from, whichever world target it belongs to now
+    world_lock = FileLock(world_lock_path(manifest["world_dir"]), timeout=ROLLBACK_LOCK_TIMEOUT)
+    try:
+        with world_lock:
+            # Another rollback of this job may have finished (or pruning removed the
+            # snapshot) while we waited for the lock
+            manifest = read_snapshot_manifest(job_id)
+            if manifest is None:
+                return jsonify({"error": "No snapshot retained for this job"}), 404
+            if manifest.get("rolled_back_at"):
+                return jsonify({"error": "Job was already rolled back", "rollback": manifest.get("rollback")}), 409
+            target = _world_target_for_dir(manifest["world_dir"])
+            if target is not None and server_reachable(target):
+                return jsonify({
+                    "error": f"The server for world '{target.name}' is running; stop it before rolling back",
+                }), 409
+            later_jobs = conflicting_jobs(job_id)
+            if later_jobs and not force:
+                return jsonify({
+                    "error": "Later jobs modified the same regions; roll them back first or pass force=true",
+                    "conflicting_jobs": later_jobs,
+                }), 409
+            result = rollback_snapshot(job_id)
+    except Timeout:
+        return jsonify({"error": "The world is locked by a running merge; try again later"}), 409
+
+    return jsonify({"status": "ok", "job_id": job_id, "world": manifest.get("world"), "rollback": result}), 200
+
+def _world_target_for_dir(world_dir):
+    """The configured world target whose local folder is `world_dir`, or None."""
+    world_dir = os.path.abspath(world_dir)
+    for target in WORLD_TARGETS.values():
+        if os.path.abspath(target.local_world_dir) == world_dir:
+            return target
+    return None
+
+@merges_bp.route("/merge/jobs/<job_id>/artifacts/<name>", methods=["GET"])
+@require_api_key
+def download_job_artifact(job_id, name):
+    """Downloads a profiling artifact (profile.prof, profile.txt or allocations.json) for a job."""
+    if not is_valid_job_id(job_id) or name not in JOB_ARTIFACTS:
+        return jsonify({"error": "Unknown job artifact"}), 404
+    path = os.path.abspath(os.path.join(job_dir(job_id), name))
+    if not os.path.isfile(path):
+        return jsonify({"error": "Unknown job artifact"}), 404
+    return send_file(path, mimetype=JOB_ARTIFACTS[name], as_attachment=True,
+                     download_name=f"{job_id}-{name}")
+
+@merges_bp.route("/merge/profiling", methods=["GET", "POST"])
+@require_api_key
+def profiling_toggle():
+    """
+    Admin toggle for profiling every merge job. POST {"enabled": true|false};
+    jobs already queued keep the setting they were queued with.
+    """
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data.get("enabled"), bool):
+            return jsonify({"error": "Expected JSON body {\"enabled\": true|false}"}), 400
+        profiling_settings["profile_all_jobs"] = data["enabled"]
+        logger.info(f"Profiling of all merge jobs {'enabled' if data['enabled'] else 'disabled'}")
+    return jsonify({"profile_all_jobs": profiling_settings["profile_all_jobs"]}), 200
@@ -0,0 +1,10 @@
+# app/routes/metrics.py
+from flask import Blueprint, Response
+from app.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
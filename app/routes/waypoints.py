@@ -2,38 +2,102 @@
 import os
 import json
 import logging
-from math import sqrt
-from flask import Blueprint, request, jsonify
+import threading
+import time
+from math import isfinite, sqrt
+from flask import Blueprint, request, jsonify, g
 from marshmallow import ValidationError
-from app.schemas.warp_schema import WarpSchema
+from app.schemas.warp_schema import WarpSchema, validate_warp_batch, warp_in_bounds
 from app.config import (
     DATA_FILE,
     DISTANCE_THRESHOLD,
-    DEFAULT_DIMENSION
+    DEFAULT_DIMENSION,
+    BULK_BATCH_SIZE,
+    BULK_MAX_ERROR_DETAILS
 )
 from app.routes.auth import require_api_key
 from app.utils.bluemap_helper import sync_waypoints_bluemap
+from app.utils.json_stream import iter_json_array
+from app.utils.metrics import HTTP_REQUEST_SECONDS, BYTES_PROCESSED
+from app.utils.spatial_index import WaypointIndex
+from app.utils.world_targets import get_world_target
 
 waypoints_bp = Blueprint('waypoints', __name__)
 
-# Load existing waypoints (existing code remains the same)
-if os.path.exists(DATA_FILE):
-    with open(DATA_FILE, 'r') as f:
-        waypoints = json.load(f)
-    updated = False
-    for wp in waypoints:
-        if 'dimension' not in wp:
-            wp['dimension'] = DEFAULT_DIMENSION
-            updated = True
-    if updated:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(waypoints, f, indent=4)
-else:
-    waypoints = []
-
-def save_waypoints():
-    with open(DATA_FILE, 'w') as f:
-        json.dump(waypoints, f, indent=4)
+@waypoints_bp.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@waypoints_bp.after_request
+def _record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - g.request_started,
+        endpoint=endpoint, method=request.method, status=response.status_code
+    )
+    if request.content_length:
+        BYTES_PROCESSED.inc(request.content_length, kind='waypoint_request')
+    return response
+
+# Waypoints held in memory; filled by load_waypoints() when the app is created
+waypoints = []
+
+# Spatial index over `waypoints`; updated in place by receive_waypoints
+waypoint_index = WaypointIndex()
+
+# Position in `waypoints` of each (dimension, lowercase name), for replacing a moved warp
+_positions = {}
+
+# Guards `waypoints`, `waypoint_index` and `_positions` against concurrent writers; held
+# only for in-memory updates and copies. Stored warp dicts are never modified (a move
+# stores a new dict), so a shallow copy of the list taken under the lock is a consistent
+# snapshot. Spatial queries need only the index's own lock.
+waypoints_lock = threading.Lock()
+
+# Serialises writes of DATA_FILE and BlueMap syncs, which run outside waypoints_lock
+_persist_lock = threading.Lock()
+
+def _write_data_file(data):
+    """Writes DATA_FILE through a temporary file renamed into place, so it is never half-written."""
+    temp_path = DATA_FILE + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, DATA_FILE)
+
+def load_waypoints():
+    """
+    Loads DATA_FILE into `waypoints` (in place) and rebuilds the spatial index.
+    Waypoints saved before dimensions were tracked get DEFAULT_DIMENSION, and the
+    file is rewritten once with it. Returns the number of waypoints loaded.
+    """
+    if os.path.exists(DATA_FILE):
+        with open(DATA_FILE, 'r') as f:
+            loaded = json.load(f)
+        updated = False
+        for wp in loaded:
+            if 'dimension' not in wp:
+                wp['dimension'] = DEFAULT_DIMENSION
+                updated = True
+        if updated:
+            _write_data_file(loaded)
+    else:
+        loaded = []
+
+    with waypoints_lock:
+        waypoints[:] = loaded
+        _positions.clear()
+        for position, wp in enumerate(waypoints):
+            _positions.setdefault((wp['dimension'], wp['name'].lower()), position)
+        waypoint_index.rebuild(waypoints, DEFAULT_DIMENSION)
+        return len(waypoints)
+
+# Upper bound on results returned by the spatial query endpoints
+MAX_QUERY_RESULTS = 1000
+
+def save_waypoints(snapshot):
+    _write_data_file(snapshot)
 
 def is_far_enough(new_wp, existing_wp):
     """Existing implementation remains the same"""
@@ -48,11 +112,63 @@ def is_far_enough(new_wp, existing_wp):
 
 warp_schema = WarpSchema()
 
+def apply_warp(warp):
+    """
+    Adds a validated warp to the store, or moves the existing warp with the same
+    name and dimension if it is far enough away. The caller holds waypoints_lock.
+    Returns 'added', 'updated', or None when nothing changed.
+    """
+    warp_name = warp['name']
+    x = warp['x']
+    y = warp['y']
+    z = warp['z']
+    dimension = warp['dimension']
+
+    existing_warp = waypoint_index.get(warp_name, dimension)
+
+    if existing_warp:
+        if is_far_enough({'x': x, 'y': y, 'z': z, 'dimension': dimension}, existing_warp):
+            moved = dict(existing_warp, x=x, y=y, z=z)
+            waypoints[_positions[(dimension, warp_name.lower())]] = moved
+            waypoint_index.move(moved)
+            return 'updated'
+        return None
+
+    new_warp = {
+        'name': warp_name,
+        'x': x,
+        'y': y,
+        'z': z,
+        'dimension': dimension
+    }
+    _positions[(dimension, warp_name.lower())] = len(waypoints)
+    waypoints.append(new_warp)
+    waypoint_index.add(new_warp)
+    return 'added'
+
+def persist_and_sync(changes_detected, force_refresh):
+    """
+    Saves the store if it changed, and pushes it to BlueMap if it changed or a
+    refresh was forced. Call without waypoints_lock: the disk and RCON work runs
+    on a snapshot under _persist_lock, so queries never wait for it. Each writer
+    snapshots after the previous one finished, so the last write wins.
+    """
+    if changes_detected or force_refresh:
+        with _persist_lock:
+            with waypoints_lock:
+                snapshot = list(waypoints)
+            if changes_detected:
+                save_waypoints(snapshot)
+                logging.info(f"Saving {len(snapshot)} waypoints to disk")
+
+            # Warps belong to the default world's server
+            logging.info(f"Syncing waypoints to BlueMap (force={force_refresh})")
+            sync_waypoints_bluemap(snapshot, get_world_target())
+
 @waypoints_bp.route('/waypoints', methods=['POST'])
 @require_api_key
 def receive_waypoints():
     """Updated endpoint with force-refresh support"""
-    global waypoints
     data = request.get_json()
 
     # Get force-refresh parameter from query string
@@ -63,8 +179,8 @@ def receive_waypoints():
 
     updated_count = 0
     added_count = 0
-    changes_detected = False
 
+    valid_warps = []
     for warp_data in data:
         try:
             warp = warp_schema.load(warp_data)
@@ -72,53 +188,22 @@ def receive_waypoints():
             logging.warning(f"Invalid warp data: {warp_data}, Errors: {err.messages}")
             continue
 
-        warp_name = warp['name']
-        x = warp['x']
-        y = warp['y']
-        z = warp['z']
-        dimension = warp['dimension']
-
-        # Existing validation checks remain the same
-        MIN_COORD = -30000000
-        MAX_COORD = 30000000
-        MIN_Y = 0
-        MAX_Y = 256
-        if not (MIN_COORD <= x <= MAX_COORD and MIN_COORD <= z <= MAX_COORD and MIN_Y <= y <= MAX_Y):
-            logging.warning(f"Invalid coords for warp '{warp_name}': x={x},y={y},z={z}")
+        if not warp_in_bounds(warp['x'], warp['y'], warp['z']):
+            logging.warning(f"Invalid coords for warp '{warp['name']}': x={warp['x']},y={warp['y']},z={warp['z']}")
             continue
+        valid_warps.append(warp)
 
-        existing_warp = next(
-            (wp for wp in waypoints
-             if wp['name'].lower() == warp_name.lower() and wp.get('dimension', DEFAULT_DIMENSION) == dimension),
-            None
-        )
-
-        if existing_warp:
-            if is_far_enough({'x': x, 'y': y, 'z': z, 'dimension': dimension}, existing_warp):
-                existing_warp.update({'x': x, 'y': y, 'z': z})
+    with waypoints_lock:
+        for warp in valid_warps:
+            result = apply_warp(warp)
+            if result == 'updated':
                 updated_count += 1
-                changes_detected = True
+            elif result == 'added':
+                added_count += 1
             else:
-                logging.info(f"Warp '{warp_name}' not updated. Distance <= {DISTANCE_THRESHOLD}.")
-        else:
-            waypoints.append({
-                'name': warp_name,
-                'x': x,
-                'y': y,
-                'z': z,
-                'dimension': dimension
-            })
-            added_count += 1
-            changes_detected = True
-
-    # Save if changes detected or forced refresh
-    if changes_detected or force_refresh:
-        if changes_detected:
-            save_waypoints()
-            logging.info(f"Saving {len(waypoints)} waypoints to disk")
+                logging.info(f"Warp '{warp['name']}' not updated. Distance <= {DISTANCE_THRESHOLD}.")
 
-        logging.info(f"Syncing waypoints to BlueMap (force={force_refresh})")
-        sync_waypoints_bluemap(waypoints)
+    persist_and_sync(updated_count + added_count > 0, force_refresh)
 
     message = f"Processed {len(data)} warps. Updated: {updated_count}, Added: {added_count}"
     if force_refresh:
@@ -127,7 +212,160 @@ def receive_waypoints():
     logging.info(message)
     return jsonify({'message': message}), 200
 
+@waypoints_bp.route('/waypoints/bulk', methods=['POST'])
+@require_api_key
+def receive_waypoints_bulk():
+    """
+    Bulk variant of POST /waypoints for large pushes. The JSON list is parsed
+    incrementally from the request stream and validated BULK_BATCH_SIZE warps at a
+    time, so memory stays bounded by the batch size rather than the payload.
+    Invalid items are summarised in the response instead of logged one by one.
+
+    Batches are applied as they complete. If the body turns out to be malformed
+    part-way, the warps before the last complete batch stay applied and saved:
+    the response is then 207 with 'applied' (items consumed, valid or not) and
+    'resume_from' (the index to resend from); 400 means nothing was applied.
+    """
+    force_refresh = request.args.get('force-refresh', 'false').lower() == 'true'
+
+    processed = 0
+    updated_count = 0
+    added_count = 0
+    error_count = 0
+    error_reasons = {}
+    error_details = []
+
+    def flush(batch, offset):
+        nonlocal updated_count, added_count, error_count
+        warps, errors = validate_warp_batch(batch)
+        for position, reason in errors:
+            error_count += 1
+            error_reasons[reason] = error_reasons.get(reason, 0) + 1
+            if len(error_details) < BULK_MAX_ERROR_DETAILS:
+                error_details.append({'index': offset + position, 'error': reason})
+        with waypoints_lock:
+            for warp in warps:
+                result = apply_warp(warp)
+                if result == 'updated':
+                    updated_count += 1
+                elif result == 'added':
+                    added_count += 1
+
+    batch = []
+    try:
+        for item in iter_json_array(request.stream):
+            batch.append(item)
+            if len(batch) >= BULK_BATCH_SIZE:
+                flush(batch, processed)
+                processed += len(batch)
+                batch = []
+    except ValueError as err:
+        error_message = f"Malformed JSON list: {err}"
+        logging.warning(f"Bulk waypoint push aborted after {processed + len(batch)} warps, "
+                        f"{processed} applied. {error_message}")
+        if not processed:
+            return jsonify({'error': error_message, 'applied': 0}), 400
+        # Keep whatever was applied from complete batches consistent on disk
+        persist_and_sync(updated_count + added_count > 0, False)
+        return jsonify({
+            'error': error_message,
+            'applied': processed,
+            'resume_from': processed,
+            'updated': updated_count,
+            'added': added_count,
+            'invalid': error_count,
+        }), 207
+    if batch:
+        flush(batch, processed)
+        processed += len(batch)
+
+    persist_and_sync(updated_count + added_count > 0, force_refresh)
+
+    if error_count:
+        logging.warning(f"Bulk waypoint push rejected {error_count} warps: {error_reasons}")
+    message = f"Processed {processed} warps. Updated: {updated_count}, Added: {added_count}, Invalid: {error_count}"
+    if force_refresh:
+        message += " | Forced BlueMap refresh"
+    logging.info(message)
+
+    return jsonify({
+        'message': message,
+        'processed': processed,
+        'updated': updated_count,
+        'added': added_count,
+        'errors': {
+            'count': error_count,
+            'by_reason': error_reasons,
+            'items': error_details,
+            'truncated': error_count > len(error_details)
+        }
+    }), 200
+
 @waypoints_bp.route('/waypoints', methods=['GET'])
 def get_waypoints_api():
     """Existing implementation remains the same"""
-    return jsonify(waypoints), 200
+    with waypoints_lock:
+        snapshot = list(waypoints)
+    return jsonify(snapshot), 200
+
+def _query_floats(*names):
+    """Reads the named query parameters as finite floats; raises ValueError naming the bad parameter."""
+    values = []
+    for name in names:
+        raw = request.args.get(name)
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"Query parameter '{name}' must be a number")
+        if not isfinite(value):
+            raise ValueError(f"Query parameter '{name}' must be a finite number")
+        values.append(value)
+    return values
+
+@waypoints_bp.route('/waypoints/nearest', methods=['GET'])
+def nearest_waypoints_api():
+    """k nearest waypoints to (x, y, z) in a dimension. Query: x, y, z, k (default 1), dimension."""
+    dimension = request.args.get('dimension', DEFAULT_DIMENSION)
+    try:
+        point = _query_floats('x', 'y', 'z')
+        k = int(request.args.get('k', '1'))
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    if not 1 <= k <= MAX_QUERY_RESULTS:
+        return jsonify({'error': f"'k' must be between 1 and {MAX_QUERY_RESULTS}"}), 400
+
+    results = waypoint_index.nearest(dimension, point, k)
+    return jsonify([dict(wp, distance=dist) for wp, dist in results]), 200
+
+@waypoints_bp.route('/waypoints/radius', methods=['GET'])
+def radius_waypoints_api():
+    """Waypoints within radius r of (x, y, z) in a dimension, nearest first. Query: x, y, z, r, dimension."""
+    dimension = request.args.get('dimension', DEFAULT_DIMENSION)
+    try:
+        x, y, z, radius = _query_floats('x', 'y', 'z', 'r')
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    if radius < 0:
+        return jsonify({'error': "'r' must not be negative"}), 400
+
+    results = waypoint_index.within_radius(dimension, (x, y, z), radius, limit=MAX_QUERY_RESULTS)
+    return jsonify([dict(wp, distance=dist) for wp, dist in results]), 200
+
+@waypoints_bp.route('/waypoints/bbox', methods=['GET'])
+def bbox_waypoints_api():
+    """
+    Waypoints inside an inclusive box in a dimension.
+    Query: min_x, min_y, min_z, max_x, max_y, max_z, dimension.
+    """
+    dimension = request.args.get('dimension', DEFAULT_DIMENSION)
+    try:
+        min_x, min_y, min_z, max_x, max_y, max_z = _query_floats(
+            'min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z'
+        )
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    results = waypoint_index.within_box(
+        dimension, (min_x, min_y, min_z), (max_x, max_y, max_z), limit=MAX_QUERY_RESULTS
+    )
+    return jsonify(results), 200
@@ -1,11 +1,19 @@
 """
 app/schemas/warp_schema.py
 
-Defines Marshmallow schemas for validating and deserializing data related to warps/waypoints.
+Defines Marshmallow schemas for validating and deserializing data related to warps/waypoints,
+plus a column-wise validator for bulk batches of warps.
 """
 
+import numpy as np
 from marshmallow import Schema, fields
 
+# Accepted warp coordinate bounds (inclusive)
+WARP_MIN_COORD = -30000000
+WARP_MAX_COORD = 30000000
+WARP_MIN_Y = 0
+WARP_MAX_Y = 256
+
 
 class WarpSchema(Schema):
     name = fields.Str(required=True)
@@ -13,3 +21,105 @@ class WarpSchema(Schema):
     y = fields.Float(required=True)
     z = fields.Float(required=True)
     dimension = fields.Str(required=True)
+
+
+# Keys a warp object may carry; like WarpSchema, anything else is rejected
+WARP_FIELDS = frozenset(WarpSchema().fields)
+
+
+def warp_in_bounds(x, y, z):
+    return (WARP_MIN_COORD <= x <= WARP_MAX_COORD and WARP_MIN_COORD <= z <= WARP_MAX_COORD
+            and WARP_MIN_Y <= y <= WARP_MAX_Y)
+
+
+def _float_column(values):
+    """
+    Converts a column of raw JSON values to float64, accepting what fields.Float accepts
+    (numbers and numeric strings, but not booleans). Returns (floats, invalid mask).
+    """
+    numeric = np.fromiter(
+        (type(v) is int or type(v) is float for v in values), dtype=bool, count=len(values)
+    )
+    try:
+        if numeric.all():
+            floats = np.array(values, dtype=np.float64)
+        else:
+            floats = np.full(len(values), np.nan)
+            floats[numeric] = np.array([v for v, ok in zip(values, numeric) if ok], dtype=np.float64)
+            for i in np.flatnonzero(~numeric):
+                if isinstance(values[i], str):
+                    try:
+                        floats[i] = float(values[i])
+                    except ValueError:
+                        pass
+    except OverflowError:
+        floats = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            if type(v) is not bool and isinstance(v, (int, float, str)):
+                try:
+                    floats[i] = float(v)
+                except (ValueError, OverflowError):
+                    pass
+    return floats, ~np.isfinite(floats)
+
+
+def validate_warp_batch(items):
+    """
+    Validates a batch of raw warp dicts column by column: the same checks as
+    WarpSchema().load followed by the coordinate bounds check, with the numeric
+    conversion and bounds tests done as vectorized operations over the batch.
+
+    Returns (warps, errors): cleaned warp dicts for the valid items in input order,
+    and a list of (position in batch, reason) for rejected items.
+    """
+    count = len(items)
+    reasons = [None if isinstance(item, dict) else "not an object" for item in items]
+    records = [item if isinstance(item, dict) else {} for item in items]
+
+    def reject(i, field, record):
+        if reasons[i] is None:
+            reasons[i] = f"missing field '{field}'" if field not in record else f"invalid field '{field}'"
+
+    for i, record in enumerate(records):
+        if reasons[i] is None and not WARP_FIELDS.issuperset(record):
+            reasons[i] = f"unknown field '{sorted(set(record) - WARP_FIELDS)[0]}'"
+
+    columns = {}
+    for field in ('name', 'dimension'):
+        column = [record.get(field) for record in records]
+        for i, value in enumerate(column):
+            if not isinstance(value, str):
+                reject(i, field, records[i])
+        columns[field] = column
+
+    coords = np.empty((count, 3), dtype=np.float64)
+    for axis, field in enumerate(('x', 'y', 'z')):
+        coords[:, axis], invalid = _float_column([record.get(field) for record in records])
+        for i in np.flatnonzero(invalid):
+            reject(i, field, records[i])
+
+    with np.errstate(invalid='ignore'):
+        in_bounds = (
+            (coords[:, 0] >= WARP_MIN_COORD) & (coords[:, 0] <= WARP_MAX_COORD)
+            & (coords[:, 2] >= WARP_MIN_COORD) & (coords[:, 2] <= WARP_MAX_COORD)
+            & (coords[:, 1] >= WARP_MIN_Y) & (coords[:, 1] <= WARP_MAX_Y)
+        )
+    for i in np.flatnonzero(~in_bounds):
+        if reasons[i] is None:
+            reasons[i] = "coordinates out of bounds"
+
+    warps = []
+    errors = []
+    xs, ys, zs = coords[:, 0].tolist(), coords[:, 1].tolist(), coords[:, 2].tolist()
+    for i in range(count):
+        if reasons[i] is not None:
+            errors.append((i, reasons[i]))
+            continue
+        warps.append({
+            'name': columns['name'][i],
+            'x': xs[i],
+            'y': ys[i],
+            'z': zs[i],
+            'dimension': columns['dimension'][i]
+        })
+    return warps, errors
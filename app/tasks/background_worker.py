@@ -1,220 +1,597 @@
 # app/tasks/background_worker.py
 import queue
 import os
+import shutil
 import tempfile
-import zipfile
+import threading
 import logging
 import subprocess
 import re
+import time
+from contextlib import contextmanager
 from threading import Lock
 from filelock import FileLock
-import amulet
-from amulet.api.errors import ChunkLoadError, ChunkDoesNotExist
-from app.utils.amulet_merge import merge_amulet_worlds
-from app.config import LOCAL_WORLD_DIR, DIMENSION_TO_WORLD_PATH
+from app.utils.amulet_loader import load_level
+from app.utils.archive_extract import extract_archive
+from app.utils.amulet_merge import merge_amulet_worlds, count_mergeable_chunks
+from app.utils.merge_preview import count_present_chunks
+from app.tasks.job_events import ProgressBroadcaster
+from app.tasks.merge_gate import MergeGate
+from app.utils.log_pipeline import LogRateLimiter
+from app.tasks.snapshots import create_snapshot
+from app.tasks.job_records import new_job_id, job_dir, write_job_record, prune_job_records
+from app.utils.profiling import JobProfiler
+from app.utils.world_targets import WORLD_TARGETS, DEFAULT_WORLD_NAME
+from app.utils.metrics import (
+    Gauge,
+    MERGE_STAGE_SECONDS,
+    MERGE_JOBS,
+    MERGE_CHUNKS,
+    MERGE_QUEUE_WAIT_SECONDS,
+    EXTRACT_THROUGHPUT,
+    BYTES_PROCESSED,
+)
+from app.config import (
+    MAX_CONCURRENT_MERGES,
+    PROGRESS_PUBLISH_INTERVAL,
+    PROFILE_ALL_JOBS,
+    PROFILE_TRACEMALLOC_FRAMES,
+    PROFILE_TOP_ALLOCATIONS,
+    PROFILE_SAMPLE_SECONDS,
+    SNAPSHOTS_ENABLED,
+)
 
 logger = logging.getLogger(__name__)
 logger.propagate = True  # Ensure we use root logger handlers
 
-# Queue for processing incoming ZIP files
-process_queue = queue.Queue()
-lock = Lock()
-
-# Global status for the current job (used for reporting progress)
-job_status = {
-    "current_job": None,     # Full path of the ZIP file being processed
-    "stage": None,           # "amulet merge" or "bluemap render"
-    "total_chunks": 0,       # Total number of non-empty chunks that will be changed (calculated once at the start)
-    "current_chunk": 0,      # Count of merged chunks processed so far
-    "render_progress": None, # Latest render progress from BlueMap (if in render stage)
-}
-
-# Global lock file path for cross-process safety
-WORLD_LOCK_PATH = os.path.join(LOCAL_WORLD_DIR, ".world_lock.lock")
-
-
-def get_current_job():
-    global job_status
-    return job_status if job_status["current_job"] is not None else None
-
-
-def get_pending_jobs():
-    with lock:
-        return list(process_queue.queue)
-
-
-def background_worker():
-    global job_status
-    while True:
-        zip_path = process_queue.get()
-        if zip_path is None:
-            break
+# Admin toggle: profile every job, not just those queued with profile=true
+profiling_settings = {"profile_all_jobs": PROFILE_ALL_JOBS}
+
+# Bounds merges running at once across all worlds, in arrival order; a profiled job runs
+# alone (see merge_gate.py). Each world also runs one job at a time
+merge_gate = MergeGate(MAX_CONCURRENT_MERGES)
+
+# Wakes SSE / long-poll watchers when any world's status changes
+progress_events = ProgressBroadcaster(PROGRESS_PUBLISH_INTERVAL)
+
+
+def _new_job_status(job=None, world=None):
+    return {
+        "world": world,              # Name of the world target the job merges into
+        "job_id": job["id"] if job else None,  # Id of the job record under JOBS_DIR
+        "current_job": job["zip_path"] if job else None,  # Full path of the uploaded archive being processed
+        "stage": None,               # "amulet merge", "relight" or "bluemap render"
+        "total_chunks": 0,           # Total number of non-empty chunks that will be changed (calculated once at the start)
+        "present_chunks": None,      # Chunks in the upload's region headers, empty or not (see merge_preview.py)
+        "current_chunk": 0,          # Count of merged chunks processed so far
+        "render_progress": None,     # Latest render progress from BlueMap (if in render stage)
+        "render_maps": {},           # Latest render progress per BlueMap map
+        "relight_total": 0,          # Chunks queued for cleanlight
+        "relight_done": 0,           # Chunks relit so far
+        "queued_at": job["queued_at"] if job else None,  # time.time() the job was queued
+        "started_at": time.time() if job else None,      # time.time() the worker picked the job up
+        "stage_started_at": None,    # time.time() the current stage began
+        "merge_started_at": None,    # time.time() chunk merging began (after extract/load/count)
+        "merge_finished_at": None,   # time.time() chunk merging ended
+        "stage_seconds": {},         # Wall time per pipeline stage (see job_stage)
+        "extract": None,             # Archive format and extraction throughput (see archive_extract.py)
+        "snapshot": None,            # Summary of the pre-save region snapshot (see snapshots.py)
+    }
+
+
+class WorldWorker:
+    """
+    Queue, status and worker thread for one world target. Jobs for the same world
+    run one after another under its world lock; jobs for different worlds run in
+    parallel, up to MAX_CONCURRENT_MERGES at once. A profiled job runs alone.
+    """
 
+    def __init__(self, target):
+        self.target = target
+        self.queue = queue.Queue()  # job dicts built by enqueue_job
+        self.lock = Lock()
+        self.status = _new_job_status(world=target.name)
+        self.waiting_job = None  # taken off the queue, waiting for the world lock or the merge gate
+        self.profiler = None  # profiler for the running job, if it was queued with profiling
+        self.thread = None
+
+    # Queue
+
+    def pending_jobs(self):
+        with self.lock:
+            waiting = [self.waiting_job] if self.waiting_job is not None else []
+            return waiting + [job for job in self.queue.queue if job is not None]
+
+    def queued_job(self, job_id):
+        for job in self.pending_jobs():
+            if job["id"] == job_id:
+                return dict(job)
+        return None
+
+    def enqueue(self, job):
+        self.queue.put(job)
+        progress_events.publish(force=True)
+
+    # Status
+
+    def current_job(self):
+        return self.status if self.status["current_job"] is not None else None
+
+    def set_stage(self, stage):
+        self.status["stage"] = stage
+        self.status["stage_started_at"] = time.time()
+        progress_events.publish(force=True)
+
+    @contextmanager
+    def job_stage(self, name):
+        """
+        Times one pipeline stage of the current job: records it in status["stage_seconds"]
+        and the stage histogram, and brackets it in the profile when the job is profiled.
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_stage(name)
+        start = time.perf_counter()
         try:
-            # Set up the current job status
-            job_status["current_job"] = zip_path
-            job_status["stage"] = "amulet merge"
-            job_status["total_chunks"] = 0
-            job_status["current_chunk"] = 0
-            job_status["render_progress"] = None
-
-            logger.info(f"Starting merge for {zip_path}")
-            process_zip(zip_path)
-            logger.info(f"Finished merge for {zip_path}")
-        except Exception as e:
-            logger.error(f"Error processing {zip_path}: {e}", exc_info=True)
+            yield
         finally:
+            elapsed = time.perf_counter() - start
+            MERGE_STAGE_SECONDS.observe(elapsed, stage=name, world=self.target.name)
+            self.status["stage_seconds"][name] = round(self.status["stage_seconds"].get(name, 0) + elapsed, 3)
+            if profiler is not None:
+                profiler.end_stage(name)
+
+    def _job_record(self, job, result, error=None):
+        status = self.status
+        return {
+            "id": job["id"],
+            "world": self.target.name,
+            "filename": os.path.basename(job["zip_path"]),
+            "queued_at": job["queued_at"],
+            "started_at": status["started_at"],
+            "finished_at": time.time(),
+            "result": result,
+            "error": error,
+            "total_chunks": status["total_chunks"],
+            "present_chunks": status["present_chunks"],
+            "merged_chunks": status["current_chunk"],
+            "relit_chunks": status["relight_done"],
+            "stage_seconds": dict(status["stage_seconds"]),
+            "extract": status["extract"],
+            "snapshot": status["snapshot"],
+            "profiled": job["profile"],
+        }
+
+    # Worker
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=f"merge-worker-{self.target.name}", daemon=True)
+        self.thread.start()
+
+    def _run_job(self, job):
+        """Runs process_zip for `job`, under the profiler if the job asked for one."""
+        if not job["profile"]:
+            self.process_zip(job["zip_path"])
+            return
+
+        profiler = JobProfiler(job_dir(job["id"], create=True),
+                               frames=PROFILE_TRACEMALLOC_FRAMES, top_n=PROFILE_TOP_ALLOCATIONS,
+                               sample_seconds=PROFILE_SAMPLE_SECONDS)
+        with profiler:
+            self.profiler = profiler
             try:
-                os.remove(zip_path)
-                logger.info(f"Deleted {zip_path} after processing.")
-            except OSError as e:
-                logger.warning(f"Failed to delete {zip_path}: {e}")
-            # Reset job status after finishing
-            job_status["current_job"] = None
-            job_status["stage"] = None
-            job_status["total_chunks"] = 0
-            job_status["current_chunk"] = 0
-            job_status["render_progress"] = None
-            process_queue.task_done()
-
-
-def process_zip(zip_path):
-    from app.utils.rcon_helper import bluemap_stop
-
-    # Create cross-process file lock; wait indefinitely for the lock
-    world_lock = FileLock(WORLD_LOCK_PATH, timeout=-1)
-    with world_lock:
+                self.process_zip(job["zip_path"])
+            finally:
+                self.profiler = None
+
+    def _admit(self, job):
+        """
+        Waits for the world lock, then for the merge gate. Taking the lock first means
+        a job blocked on a lock held elsewhere (a rollback, the compaction tool, another
+        process) does not sit on a merge slot meanwhile. Returns the held world lock
+        and the seconds spent waiting for it.
+        """
+        world_lock = FileLock(self.target.lock_path, timeout=-1)
+        start = time.perf_counter()
+        world_lock.acquire()
+        lock_wait = time.perf_counter() - start
+        merge_gate.acquire(exclusive=job["profile"])
+        return world_lock, lock_wait
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            zip_path = job["zip_path"]
+            result, error = "success", None
+
+            with self.lock:
+                self.waiting_job = job
+            world_lock = None
+            try:
+                world_lock, lock_wait = self._admit(job)
+                with self.lock:
+                    self.waiting_job = None
+                # Set up the current job status
+                self.status = _new_job_status(job, world=self.target.name)
+                self.status["stage_seconds"]["lock_wait"] = round(lock_wait, 3)
+                MERGE_STAGE_SECONDS.observe(lock_wait, stage="lock_wait", world=self.target.name)
+                MERGE_QUEUE_WAIT_SECONDS.observe(self.status["started_at"] - job["queued_at"])
+                self.set_stage("amulet merge")
+
+                logger.info(f"Starting merge for {zip_path} into world '{self.target.name}' (job {job['id']})")
+                self._run_job(job)
+                logger.info(f"Finished merge for {zip_path}")
+            except Exception as e:
+                result, error = "failed", str(e)
+                logger.error(f"Error processing {zip_path}: {e}", exc_info=True)
+            finally:
+                if world_lock is None:
+                    # The world lock could not be taken; the job never started
+                    with self.lock:
+                        self.waiting_job = None
+                else:
+                    merge_gate.release(exclusive=job["profile"])
+                    world_lock.release()
+                MERGE_JOBS.inc(result=result, world=self.target.name)
+                try:
+                    write_job_record(self._job_record(job, result, error))
+                    prune_job_records()
+                except OSError as e:
+                    logger.warning(f"Failed to write job record for {job['id']}: {e}")
+                try:
+                    os.remove(zip_path)
+                    logger.info(f"Deleted {zip_path} after processing.")
+                except OSError as e:
+                    logger.warning(f"Failed to delete {zip_path}: {e}")
+                # Reset job status after finishing
+                self.status = _new_job_status(world=self.target.name)
+                progress_events.publish(force=True)
+                self.queue.task_done()
+
+    def process_zip(self, zip_path):
+        from app.utils.rcon_helper import bluemap_stop
+        target = self.target
+        status = self.status
+
+        # The caller holds the world lock (see _admit)
         with tempfile.TemporaryDirectory() as tmpdir:
             extracted_dir = os.path.join(tmpdir, "extracted_world")
-            with zipfile.ZipFile(zip_path, 'r') as zf:
-                zf.extractall(extracted_dir)
-
-            logger.debug(f"Extracted {zip_path} into {extracted_dir}")
+            with self.job_stage("extract"):
+                extract = status["extract"] = extract_archive(zip_path, extracted_dir)
+                if not os.path.isfile(os.path.join(extracted_dir, "level.dat")):
+                    # Region-only archive: borrow the local level.dat so Amulet can open it
+                    shutil.copy2(os.path.join(target.local_world_dir, "level.dat"), extracted_dir)
+                # Per-chunk stage rates for merge previews are taken against this count
+                status["present_chunks"] = count_present_chunks(extracted_dir)
+            BYTES_PROCESSED.inc(extract["archive_bytes"], kind="upload")
+            BYTES_PROCESSED.inc(extract["bytes"], kind="extracted")
+            EXTRACT_THROUGHPUT.observe(extract["mb_per_sec"], format=extract["format"])
+            progress_events.publish(force=True)
+
+            logger.info(f"Extracted {extract['files']} files ({extract['format']}, "
+                        f"{extract['mb_per_sec']} MB/s on {extract['workers']} threads) from {zip_path}")
 
             # Load the uploaded and local worlds
-            uploaded_world = amulet.load_level(extracted_dir)
-            local_world = amulet.load_level(LOCAL_WORLD_DIR)
+            with self.job_stage("world_load"):
+                uploaded_world = load_level(extracted_dir)
+                local_world = load_level(target.local_world_dir)
 
             try:
                 # Stop BlueMap via RCON before starting the merge
-                bluemap_stop()
+                bluemap_stop(target)
 
                 # Calculate total number of non-empty chunks that will be merged at the start.
-                from app.utils.amulet_merge import is_chunk_empty
-                total_to_merge = 0
-                for dimension in uploaded_world.dimensions:
-                    coords = list(uploaded_world.all_chunk_coords(dimension))
-                    for (cx, cz) in coords:
-                        try:
-                            chunk = uploaded_world.get_chunk(cx, cz, dimension)
-                        except (ChunkLoadError, ChunkDoesNotExist):
-                            continue
-                        if not is_chunk_empty(chunk):
-                            total_to_merge += 1
-                job_status["total_chunks"] = total_to_merge
-                logger.info(f"Total chunks to merge: {job_status['total_chunks']}")
+                with self.job_stage("count"):
+                    status["total_chunks"] = count_mergeable_chunks(uploaded_world)
+                status["merge_started_at"] = time.time()
+                progress_events.publish(force=True)
+                logger.info(f"Total chunks to merge: {status['total_chunks']}")
 
                 # Define a callback to update merge progress from Amulet merging
                 def update_merge_progress(merged_count):
-                    job_status["current_chunk"] = merged_count
+                    status["current_chunk"] = merged_count
+                    progress_events.publish()
 
                 # Merge worlds; progress is updated during the merge process
-                merged_chunks = merge_amulet_worlds(
-                    uploaded_world, local_world, progress_callback=update_merge_progress
-                )
-                logger.debug(f"Merged {job_status['current_chunk']} uploaded chunks from {zip_path}")
+                with self.job_stage("merge"):
+                    merged_chunks = merge_amulet_worlds(
+                        uploaded_world, local_world, progress_callback=update_merge_progress
+                    )
+                status["merge_finished_at"] = time.time()
+                MERGE_CHUNKS.inc(len(merged_chunks), world=target.name)
+                logger.debug(f"Merged {status['current_chunk']} uploaded chunks from {zip_path}")
+
+                # Preserve the region files the save will rewrite, so the job can be rolled back
+                if SNAPSHOTS_ENABLED:
+                    with self.job_stage("snapshot"):
+                        status["snapshot"] = create_snapshot(status["job_id"], target.local_world_dir,
+                                                             merged_chunks, world=target.name)
+                    logger.info(f"Snapshotted {status['snapshot']['files']} world files before saving")
 
                 # Save the merged local world
-                local_world.save()
-                logger.info(f"Saved changes to {LOCAL_WORLD_DIR}")
+                with self.job_stage("save"):
+                    local_world.save()
+                logger.info(f"Saved changes to {target.local_world_dir}")
             finally:
                 local_world.close()
                 uploaded_world.close()
 
             logger.info(f"Closed world handles for {zip_path}")
 
-            # Recalculate lighting for each merged chunk (this stage does not update progress counters)
-            for (dim, cx, cz) in merged_chunks:
-                mapped_world = DIMENSION_TO_WORLD_PATH.get(dim, "world")
-                from app.utils.rcon_helper import cleanlight_at
-                cleanlight_at(cx, cz, 1, mapped_world)
+            # Recalculate lighting for each merged chunk
+            status["relight_total"] = len(merged_chunks)
+            self.set_stage("relight")
+            from app.utils.rcon_helper import cleanlight_at
+            with self.job_stage("relight"):
+                for (dim, cx, cz) in merged_chunks:
+                    mapped_world = target.dimension_world_paths.get(dim, "world")
+                    cleanlight_at(cx, cz, 1, mapped_world, target)
+                    status["relight_done"] += 1
+                    progress_events.publish()
 
             # Switch stage to BlueMap rendering and initialize render progress
-            job_status["stage"] = "bluemap render"
-            job_status["render_progress"] = None
-            run_bluemap_render()
+            status["render_progress"] = None
+            self.set_stage("bluemap render")
+            with self.job_stage("bluemap_render"):
+                self.run_bluemap_render()
+
+    def run_bluemap_render(self):
+        """
+        Starts the BlueMap jar process and reads its output line‐by‐line.
+        It parses lines matching progress updates (e.g.:
+          Update map 'world': 0.301% (ETA: 8:38:20)
+        ) and stores this information in status["render_progress"].
+        When a line containing "Your maps are now all up-to-date!" is detected,
+        the process is terminated.
+        """
+        from app.config import (
+            BLUEMAP_LOG_INTERVAL,
+            BLUEMAP_LOG_BURST,
+            BLUEMAP_PROGRESS_LOG_INTERVAL,
+        )
+        target = self.target
+        status = self.status
+
+        # Compute the --maps argument by stripping the '.conf' extension from each config filename
+        maps_list = [conf.replace(".conf", "") for conf in target.dimension_bluemap_confs.values()]
+        maps_arg = ",".join(maps_list)
+
+        cmd = [
+            target.java_path, "-jar", target.bluemap_jar,
+            "--config", target.bluemap_config_location,
+            "--watch",
+            "--mc-version", target.mc_version,
+            "--mods", target.bluemap_mods,
+            "--maps", maps_arg,
+            "--render"
+        ]
+
+        logger.info(f"Starting BlueMap render process with command: {' '.join(cmd)}")
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            cwd=target.bluemap_working_dir  # Set the working directory here
+        )
+
+        # Regular expression to capture render progress lines
+        progress_pattern = re.compile(r"Update map '(.+?)':\s+([\d\.]+)%\s+\(ETA:\s+([^)]+)\)")
+        # BlueMap can print thousands of lines per render; sample them rather than logging each
+        output_limiter = LogRateLimiter(BLUEMAP_LOG_INTERVAL, BLUEMAP_LOG_BURST)
+        progress_limiter = LogRateLimiter(BLUEMAP_PROGRESS_LOG_INTERVAL)
+        try:
+            while True:
+                line = process.stdout.readline()
+                if not line:
+                    break
+
+                # Check for progress update
+                match = progress_pattern.search(line)
+                if match:
+                    suppressed = progress_limiter.check(match.group(1), force=float(match.group(2)) >= 100)
+                else:
+                    suppressed = output_limiter.check("output", force="Your maps are now all up-to-date!" in line)
+                if suppressed is not None:
+                    note = f" ({suppressed} similar lines suppressed)" if suppressed else ""
+                    logger.info(f"BlueMap [{target.name}]: {line.strip()}{note}")
+
+                if match:
+                    status["render_progress"] = {
+                        "map": match.group(1),
+                        "percent": float(match.group(2)),
+                        "eta": match.group(3)
+                    }
+                    status["render_maps"][match.group(1)] = {
+                        "percent": float(match.group(2)),
+                        "eta": match.group(3)
+                    }
+                    progress_events.publish()
+                if "Your maps are now all up-to-date!" in line:
+                    logger.info("BlueMap render complete signal received.")
+                    break
+
+            # Terminate the BlueMap process once rendering is complete
+            process.terminate()
+            process.wait(timeout=10)
+            suppressed_total = output_limiter.total_suppressed + progress_limiter.total_suppressed
+            logger.info(f"BlueMap render process terminated ({suppressed_total} output lines not logged).")
+        except Exception as e:
+            logger.error(f"Error during BlueMap render: {e}", exc_info=True)
+            process.kill()
+        finally:
+            if process.poll() is None:
+                process.kill()
 
 
-def run_bluemap_render():
-    """
-    Starts the BlueMap jar process and reads its output line‐by‐line.
-    It parses lines matching progress updates (e.g.:
-      Update map 'world': 0.301% (ETA: 8:38:20)
-    ) and stores this information in job_status["render_progress"].
-    When a line containing "Your maps are now all up-to-date!" is detected,
-    the process is terminated.
-    """
-    from app.config import (
-        BLUEMAP_JAR,
-        BLUEMAP_CONFIG_LOCATION,
-        MC_VERSION,
-        BLUEMAP_MODS,
-        DIMENSION_TO_BLUEMAP_CONF,
-        JAVA_PATH,
-        BLUEMAP_WORKING_DIR,
-    )
-
-    # Compute the --maps argument by stripping the '.conf' extension from each config filename
-    maps_list = [conf.replace(".conf", "") for conf in DIMENSION_TO_BLUEMAP_CONF.values()]
-    maps_arg = ",".join(maps_list)
-
-    cmd = [
-        JAVA_PATH, "-jar", BLUEMAP_JAR,
-        "--config", BLUEMAP_CONFIG_LOCATION,
-        "--watch",
-        "--mc-version", MC_VERSION,
-        "--mods", BLUEMAP_MODS,
-        "--maps", maps_arg,
-        "--render"
+# One worker per configured world target
+world_workers = {name: WorldWorker(target) for name, target in WORLD_TARGETS.items()}
+
+MERGE_QUEUE_DEPTH = Gauge(
+    "worldsync_merge_queue_depth",
+    "Merge jobs waiting in the queue, across all worlds.",
+    callback=lambda: sum(len(worker.pending_jobs()) for worker in world_workers.values()),
+)
+
+
+def get_worker(world=None):
+    """The worker for `world` (the default world for None), or None for an unknown world."""
+    return world_workers.get(world or DEFAULT_WORLD_NAME)
+
+
+def get_current_job(world=None):
+    """Status of the job running in `world`; with no world, of the default world's job or else any running one."""
+    if world is not None:
+        worker = get_worker(world)
+        return worker.current_job() if worker else None
+    workers = [get_worker()] + [w for name, w in world_workers.items() if name != DEFAULT_WORLD_NAME]
+    for worker in workers:
+        if worker.current_job() is not None:
+            return worker.current_job()
+    return None
+
+
+def _selected_workers(world):
+    if world is None:
+        return list(world_workers.values())
+    worker = get_worker(world)
+    return [worker] if worker else []
+
+
+def get_pending_jobs(world=None):
+    return [job["zip_path"] for worker in _selected_workers(world) for job in worker.pending_jobs()]
+
+
+def get_pending_job_details(world=None):
+    """Pending jobs with how long each has been waiting, oldest first."""
+    now = time.time()
+    jobs = [(worker.target.name, job) for worker in _selected_workers(world) for job in worker.pending_jobs()]
+    jobs.sort(key=lambda item: item[1]["queued_at"])
+    return [
+        {"id": job["id"], "world": name, "zip_path": job["zip_path"],
+         "wait_seconds": round(now - job["queued_at"], 1)}
+        for name, job in jobs
     ]
 
-    logger.info(f"Starting BlueMap render process with command: {' '.join(cmd)}")
-    process = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        cwd=BLUEMAP_WORKING_DIR  # Set the working directory here
-    )
-
-    # Regular expression to capture render progress lines
-    progress_pattern = re.compile(r"Update map '(.+?)':\s+([\d\.]+)%\s+\(ETA:\s+([^)]+)\)")
-    try:
-        while True:
-            line = process.stdout.readline()
-            if not line:
-                break
-            logger.info(f"BlueMap: {line.strip()}")
-
-            # Check for progress update
-            match = progress_pattern.search(line)
-            if match:
-                job_status["render_progress"] = {
-                    "map": match.group(1),
-                    "percent": float(match.group(2)),
-                    "eta": match.group(3)
-                }
-            if "Your maps are now all up-to-date!" in line:
-                logger.info("BlueMap render complete signal received.")
-                break
 
-        # Terminate the BlueMap process once rendering is complete
-        process.terminate()
-        process.wait(timeout=10)
-        logger.info("BlueMap render process terminated.")
-    except Exception as e:
-        logger.error(f"Error during BlueMap render: {e}", exc_info=True)
-        process.kill()
-    finally:
-        if process.poll() is None:
-            process.kill()
+def get_queued_job(job_id):
+    """The pending job with `job_id` (a copy, with its "world"), or None if it is not waiting in a queue."""
+    for worker in world_workers.values():
+        job = worker.queued_job(job_id)
+        if job is not None:
+            job["world"] = worker.target.name
+            return job
+    return None
+
+
+def enqueue_job(zip_path, profile=False, world=None):
+    """Queues a merge of `zip_path` into `world` (default world for None); returns the new job id."""
+    worker = get_worker(world)
+    if worker is None:
+        raise ValueError(f"Unknown world: {world!r}")
+    job = {
+        "id": new_job_id(),
+        "zip_path": zip_path,
+        "queued_at": time.time(),
+        "profile": profile or profiling_settings["profile_all_jobs"],
+    }
+    worker.enqueue(job)
+    return job["id"]
+
+
+def _status_payload(job, now):
+    payload = {
+        "job_id": job["job_id"],
+        "current_job": job["current_job"],
+        "stage": job["stage"],
+        "queue_wait_seconds": round(job["started_at"] - job["queued_at"], 1),
+        "elapsed_seconds": round(now - job["started_at"], 1),
+        "stage_elapsed_seconds": round(now - job["stage_started_at"], 1) if job["stage_started_at"] else None,
+    }
+
+    merge = {"total_chunks": job["total_chunks"], "current_chunk": job["current_chunk"],
+             "chunks_per_sec": None, "eta_seconds": None}
+    if job["merge_started_at"] and job["current_chunk"]:
+        end = job["merge_finished_at"] or now
+        rate = job["current_chunk"] / max(end - job["merge_started_at"], 1e-6)
+        merge["chunks_per_sec"] = round(rate, 1)
+        if not job["merge_finished_at"]:
+            merge["eta_seconds"] = round((job["total_chunks"] - job["current_chunk"]) / rate, 1)
+    payload["merge"] = merge
+
+    relight = {"total_chunks": job["relight_total"], "done_chunks": job["relight_done"],
+               "chunks_per_sec": None, "eta_seconds": None}
+    if job["stage"] == "relight" and job["relight_done"]:
+        rate = job["relight_done"] / max(now - job["stage_started_at"], 1e-6)
+        relight["chunks_per_sec"] = round(rate, 2)
+        relight["eta_seconds"] = round((job["relight_total"] - job["relight_done"]) / rate, 1)
+    payload["relight"] = relight
+
+    payload["render"] = {"maps": dict(job["render_maps"])}
+    payload["extract"] = job["extract"]
+    return payload
+
+
+# Latest progress_snapshot per world, shared by every watcher of the same version
+_shared_snapshots = {}
+_shared_snapshots_lock = Lock()
+
+
+def shared_progress_snapshot(world=None):
+    """
+    progress_snapshot(world), built once per published version and shared by all
+    SSE / long-poll watchers. The returned dict must not be modified.
+    """
+    name = get_worker(world).target.name
+    version = progress_events.version
+    with _shared_snapshots_lock:
+        cached = _shared_snapshots.get(name)
+    if cached is not None and cached["version"] == version:
+        return cached
+    snapshot = progress_snapshot(name)
+    with _shared_snapshots_lock:
+        _shared_snapshots[name] = snapshot
+    return snapshot
+
+
+def progress_snapshot(world=None):
+    """
+    Builds the payload served by the push-based status endpoints: stage, merge
+    throughput, relight progress, per-map render progress and queue wait times for
+    one world (the default world for None), plus a one-line summary of every world.
+    Called from request threads only; the workers never pay for it.
+    """
+    now = time.time()
+    worker = get_worker(world)
+    job = dict(worker.status)  # point-in-time copy; the worker keeps mutating its status
+    snapshot = {
+        "version": progress_events.version,
+        "world": worker.target.name,
+        "current_job": None,
+        "stage": None,
+        "pending_jobs": get_pending_job_details(worker.target.name),
+    }
+    snapshot["queue_size"] = len(snapshot["pending_jobs"])
+    snapshot["worlds"] = {
+        name: {
+            "job_id": other.status["job_id"],
+            "stage": other.status["stage"],
+            "queue_size": len(other.pending_jobs()),
+        }
+        for name, other in world_workers.items()
+    }
+    if job["current_job"] is None or job["started_at"] is None:
+        return snapshot
+
+    snapshot.update(_status_payload(job, now))
+    return snapshot
+
+
+def start_workers():
+    """Starts one worker thread per world target."""
+    for worker in world_workers.values():
+        worker.start()
+    logger.info(f"Started merge workers for {len(world_workers)} world(s); "
+                f"up to {MAX_CONCURRENT_MERGES} merge(s) at once")
@@ -0,0 +1,172 @@
+"""
+app/tasks/compaction.py
+
+Region file compaction. Amulet saves a changed chunk into the first free run of
+sectors that fits it, or at the end of the file, and never shrinks the file, so
+repeated merges leave .mca files full of dead sectors. Compaction rewrites a
+region file with its live chunk records (timestamps and external-chunk markers
+included, bytes unchanged) back to back, into a temporary file next to it that
+then replaces it in one rename. Readers see either the old file or the new one.
+
+The world's server must be stopped. A running server keeps the region files it
+has loaded open and writes through those handles, so after the rename its
+writes land in the replaced file and are lost; save-off / save-all flush do not
+close them. Merges do not compact: their relight and render stages drive the
+running server over RCON, so it is always up by then. Compaction is therefore a
+maintenance-window tool, run over a whole world while its server is down; it
+refuses to run while anything answers on the world's RCON port, and waits for
+the world lock so it never overlaps a merge:
+
+    python -m app.tasks.compaction --world survival [--dry-run] [--min-reclaim BYTES]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+
+from app.utils.region_file import (
+    HEADER_SIZE,
+    SECTOR_SIZE,
+    live_region_bytes,
+    parse_location_table,
+    read_region_chunks,
+    region_coords,
+    write_region_file,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-dimension folders holding region-format files
+COMPACTION_LAYERS = ("region", "entities", "poi")
+TEMP_SUFFIX = ".compact.tmp"
+
+
+def region_usage(path):
+    """(file bytes, bytes the file would take compacted) from its header alone."""
+    with open(path, "rb") as f:
+        header = f.read(SECTOR_SIZE)
+        size = os.fstat(f.fileno()).st_size
+    if size < HEADER_SIZE:
+        return size, size
+    return size, live_region_bytes(parse_location_table(header))
+
+
+def compact_region_file(path, min_reclaim=0):
+    """
+    Rewrites the region file at `path` contiguously if that frees at least
+    `min_reclaim` bytes. Returns (bytes before, bytes after); equal when the file
+    was left alone. Raises ValueError for a file whose header does not match its
+    contents, which is never rewritten.
+    """
+    temp_path = path + TEMP_SUFFIX
+    if os.path.exists(temp_path):
+        os.remove(temp_path)  # left by an interrupted compaction; the original is intact
+
+    size, live = region_usage(path)
+    if size - live < max(min_reclaim, 1):
+        return size, size
+
+    with open(path, "rb") as f:
+        chunks, timestamps = read_region_chunks(f.read())
+    try:
+        new_size = write_region_file(temp_path, chunks, timestamp=timestamps)
+        shutil.copymode(path, temp_path)
+        with open(temp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size, new_size
+
+
+def world_region_files(world_dir):
+    """Every region-format file of every dimension in the world."""
+    paths = []
+    for root, _, files in os.walk(world_dir):
+        if os.path.basename(root) in COMPACTION_LAYERS:
+            paths.extend(os.path.join(root, name) for name in files if region_coords(name) is not None)
+    return sorted(paths)
+
+
+def compact_regions(paths, min_reclaim=None, dry_run=False):
+    """
+    Compacts each region file in `paths` (see compact_region_file); the caller
+    must hold the world lock. With dry_run, only measures what would be reclaimed.
+    Returns a summary with bytes_reclaimed and the files that could not be read.
+    """
+    from app.config import COMPACTION_MIN_RECLAIM_BYTES
+    min_reclaim = COMPACTION_MIN_RECLAIM_BYTES if min_reclaim is None else min_reclaim
+    started = time.perf_counter()
+    summary = {
+        "files_scanned": 0,
+        "files_compacted": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "bytes_reclaimed": 0,
+        "failed": [],
+        "dry_run": dry_run,
+    }
+    for path in paths:
+        try:
+            if dry_run:
+                before, after = region_usage(path)
+                if before - after < max(min_reclaim, 1):
+                    after = before
+            else:
+                before, after = compact_region_file(path, min_reclaim)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not compact {path}: {e}")
+            summary["failed"].append(path)
+            continue
+        summary["files_scanned"] += 1
+        summary["bytes_before"] += before
+        summary["bytes_after"] += after
+        if after < before:
+            summary["files_compacted"] += 1
+    summary["bytes_reclaimed"] = summary["bytes_before"] - summary["bytes_after"]
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def main():
+    from filelock import FileLock, Timeout
+    from app.utils.rcon_helper import server_reachable
+    from app.utils.world_targets import WORLD_TARGETS, get_world_target
+
+    parser = argparse.ArgumentParser(description="Compact the region files of a world target.")
+    parser.add_argument("--world", help="World target name (default: the default world)")
+    parser.add_argument("--min-reclaim", type=int, default=None,
+                        help="Only rewrite files that shrink by at least this many bytes "
+                             "(default COMPACTION_MIN_RECLAIM_BYTES)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be reclaimed without writing")
+    parser.add_argument("--lock-timeout", type=float, default=-1,
+                        help="Seconds to wait for the world lock (default: wait for running merges)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+
+    target = get_world_target(args.world)
+    if target is None:
+        parser.error(f"unknown world {args.world!r}; configured: {', '.join(sorted(WORLD_TARGETS))}")
+    if not args.dry_run and server_reachable(target):
+        parser.exit(1, f"The server for world '{target.name}' is running "
+                       f"(RCON {target.rcon_host}:{target.rcon_port} answers); stop it before compacting\n")
+
+    try:
+        with FileLock(target.lock_path, timeout=args.lock_timeout):
+            paths = world_region_files(target.local_world_dir)
+            logger.info(f"Compacting {len(paths)} region files in {target.local_world_dir}")
+            summary = compact_regions(paths, args.min_reclaim, dry_run=args.dry_run)
+    except Timeout:
+        parser.exit(1, f"World '{target.name}' is locked by a running merge; try again later\n")
+
+    summary["world"] = target.name
+    print(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+app/tasks/job_events.py
+
+Change notification for merge job progress, used by the push-based status
+endpoints (SSE and long-poll).
+
+The worker only bumps a version number and wakes any waiters; the watchers then
+share one payload per version (see shared_progress_snapshot). Publishing therefore
+costs the worker the same whether zero or a hundred clients are watching.
+"""
+
+import time
+from threading import Condition, Timer
+
+
+class ProgressBroadcaster:
+    def __init__(self, min_interval):
+        self._condition = Condition()
+        self._version = 0
+        self._last_publish = 0.0
+        self._min_interval = min_interval
+        self._trailing = None  # Timer publishing the changes coalesced away in the current window
+
+    @property
+    def version(self):
+        return self._version
+
+    def publish(self, force=False):
+        """
+        Signals that job status changed. Unforced publishes (per-chunk progress,
+        BlueMap output) are coalesced to at most one per `min_interval` seconds;
+        one arriving inside the window is published when the window ends, so the
+        last change is never lost. Stage transitions should pass force=True.
+        """
+        now = time.monotonic()
+        wait = self._min_interval - (now - self._last_publish)
+        if not force and wait > 0:
+            if self._trailing is None:
+                with self._condition:
+                    if self._trailing is None:
+                        self._trailing = Timer(wait, self._publish_trailing)
+                        self._trailing.daemon = True
+                        self._trailing.start()
+            return
+        with self._condition:
+            self._bump(now)
+
+    def _publish_trailing(self):
+        with self._condition:
+            self._trailing = None
+            self._bump(time.monotonic())
+
+    def _bump(self, now):
+        """Publishes a new version; the caller holds the condition."""
+        if self._trailing is not None:
+            self._trailing.cancel()
+            self._trailing = None
+        self._version += 1
+        self._last_publish = now
+        self._condition.notify_all()
+
+    def wait(self, since, timeout):
+        """Blocks until the version differs from `since` or `timeout` elapses; returns the current version."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._version != since, timeout)
+            return self._version
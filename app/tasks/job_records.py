@@ -0,0 +1,79 @@
+"""
+app/tasks/job_records.py
+
+Per-job record directories under JOBS_DIR. Each merge job gets JOBS_DIR/<job_id>/
+holding job.json (timings, counts, result) plus any artifacts produced for that
+job, such as profiles.
+"""
+
+import json
+import os
+import re
+import shutil
+import uuid
+import logging
+from app.config import JOBS_DIR, JOB_HISTORY_LIMIT
+
+logger = logging.getLogger(__name__)
+
+JOB_RECORD_FILE = "job.json"
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def is_valid_job_id(job_id):
+    return bool(_JOB_ID_PATTERN.match(job_id or ""))
+
+
+def job_dir(job_id, create=False):
+    """Returns JOBS_DIR/<job_id>, rejecting anything that is not a generated job id."""
+    if not is_valid_job_id(job_id):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    path = os.path.join(JOBS_DIR, job_id)
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_job_record(record):
+    """Atomically writes `record` (which must contain 'id') to its job.json."""
+    path = os.path.join(job_dir(record["id"], create=True), JOB_RECORD_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def read_job_record(job_id):
+    """Returns the stored record for `job_id`, or None if there is none."""
+    try:
+        with open(os.path.join(job_dir(job_id), JOB_RECORD_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_job_records(limit=None):
+    """Stored job records, newest first."""
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    records = []
+    for name in os.listdir(JOBS_DIR):
+        if is_valid_job_id(name):
+            record = read_job_record(name)
+            if record is not None:
+                records.append(record)
+    records.sort(key=lambda r: r.get("queued_at") or 0, reverse=True)
+    return records[:limit] if limit else records
+
+
+def prune_job_records():
+    """Deletes the oldest job directories beyond JOB_HISTORY_LIMIT."""
+    for record in list_job_records()[JOB_HISTORY_LIMIT:]:
+        try:
+            shutil.rmtree(job_dir(record["id"]))
+        except OSError as e:
+            logger.warning(f"Failed to prune job record {record['id']}: {e}")
@@ -0,0 +1,47 @@
+"""
+app/tasks/merge_gate.py
+
+Admission control for merge jobs across all worlds. Up to `slots` shared jobs
+run at once; an exclusive job (a profiled one: tracemalloc is process-wide, so
+merges of other worlds would skew its profile) runs alone.
+
+Jobs are admitted strictly in the order they arrived. A waiting exclusive job
+holds back the shared jobs behind it, so a steady stream of shared jobs cannot
+keep it from ever finding the gate empty.
+"""
+
+from threading import Condition
+
+
+class MergeGate:
+    def __init__(self, slots):
+        self.slots = slots
+        self._condition = Condition()
+        self._next_ticket = 0  # handed to the next job that arrives
+        self._serving = 0      # ticket of the job at the head of the line
+        self._running = 0
+        self._exclusive = False
+
+    def _admits(self, exclusive):
+        if self._exclusive:
+            return False
+        return self._running == 0 if exclusive else self._running < self.slots
+
+    def acquire(self, exclusive=False):
+        """Blocks until it is this caller's turn and there is room for it."""
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._condition.wait_for(lambda: self._serving == ticket and self._admits(exclusive))
+            self._serving += 1
+            self._running += 1
+            self._exclusive = exclusive
+            # The next ticket may fit alongside this job
+            self._condition.notify_all()
+
+    def release(self, exclusive=False):
+        with self._condition:
+            self._running -= 1
+            if exclusive:
+                self._exclusive = False
+            self._condition.notify_all()
@@ -0,0 +1,230 @@
+"""
+app/tasks/snapshots.py
+
+Per-job snapshots of the local world files a merge is about to rewrite, so a bad
+upload can be rolled back. Only the touched files are preserved: level.dat and,
+for every region the merge wrote to, that region's file in each Anvil layer
+(region/, entities/) plus any external .mcc chunk files of merged chunks.
+
+Amulet rewrites region files in place, so preserving one needs a separate copy of
+its bytes. A reflink (copy-on-write clone) is used where the filesystem supports
+it, making the snapshot near-free; otherwise the file is copied. Rollback moves
+the preserved files back with a rename where possible, so it costs time in
+proportion to the number of files touched, not the size of the world.
+
+Layout, next to the job record:
+    JOBS_DIR/<job_id>/snapshot.json      manifest
+    JOBS_DIR/<job_id>/snapshot/<path>    preserved files, by path relative to the world
+"""
+
+import errno
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+
+from app.config import JOBS_DIR, SNAPSHOT_RETENTION
+from app.tasks.job_records import job_dir, is_valid_job_id
+from app.utils.region_file import chunk_region, dimension_region_dir, region_file_name
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MANIFEST_FILE = "snapshot.json"
+SNAPSHOT_FILES_DIR = "snapshot"
+# Anvil layers stored as per-region files next to each other in a dimension folder
+REGION_LAYERS = ("region", "entities")
+# linux/fs.h FICLONE: clone a whole file into another on the same CoW filesystem
+FICLONE = 0x40049409
+
+
+def touched_world_files(world_dir, merged_chunks):
+    """Paths, relative to `world_dir`, that saving a merge of `merged_chunks` can rewrite or create."""
+    paths = {"level.dat"}
+    for dimension, cx, cz in merged_chunks:
+        region_dir = dimension_region_dir(dimension)
+        dimension_dir = os.path.dirname(region_dir)
+        rx, rz = chunk_region(cx, cz)
+        for layer in REGION_LAYERS:
+            paths.add(os.path.join(dimension_dir, layer, region_file_name(rx, rz)))
+        external = os.path.join(region_dir, f"c.{cx}.{cz}.mcc")
+        if os.path.exists(os.path.join(world_dir, external)):
+            paths.add(external)
+    return sorted(paths)
+
+
+def _reflink(src, dst):
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def _preserve(src, dst):
+    """Copies `src` to `dst`, by reflink if the filesystem allows. Returns the method used."""
+    try:
+        _reflink(src, dst)
+        shutil.copystat(src, dst)
+        return "reflink"
+    except OSError as e:
+        if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EPERM):
+            raise
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def _restore(src, dst):
+    """Moves a preserved file back into the world; returns the method used."""
+    tmp_path = f"{dst}.rollback"
+    try:
+        os.replace(src, dst)
+        return "rename"
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    # Snapshot on another filesystem: copy next to the target, then swap it in atomically
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+    os.remove(src)
+    return "copy"
+
+
+def _manifest_path(job_id):
+    return os.path.join(job_dir(job_id), SNAPSHOT_MANIFEST_FILE)
+
+
+def _write_manifest(job_id, manifest):
+    path = _manifest_path(job_id)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def read_snapshot_manifest(job_id):
+    """The snapshot manifest for `job_id`, or None if the job has no (retained) snapshot."""
+    try:
+        with open(_manifest_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_summary(manifest):
+    return {
+        "files": len(manifest["entries"]),
+        "bytes": sum(entry["bytes"] for entry in manifest["entries"]),
+        "methods": manifest["methods"],
+        "seconds": manifest["seconds"],
+        "rolled_back_at": manifest.get("rolled_back_at"),
+    }
+
+
+def create_snapshot(job_id, world_dir, merged_chunks, world=None):
+    """
+    Preserves the world files a save of `merged_chunks` will touch and writes the
+    manifest, recording `world` as the target the job merged into. Files that do not exist yet are recorded so rollback can delete them.
+    Returns the snapshot summary.
+    """
+    started = time.perf_counter()
+    files_dir = os.path.join(job_dir(job_id, create=True), SNAPSHOT_FILES_DIR)
+    entries = []
+    methods = {}
+    for rel_path in touched_world_files(world_dir, merged_chunks):
+        src = os.path.join(world_dir, rel_path)
+        if not os.path.isfile(src):
+            entries.append({"path": rel_path, "existed": False, "method": None, "bytes": 0})
+            continue
+        dst = os.path.join(files_dir, rel_path)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        method = _preserve(src, dst)
+        methods[method] = methods.get(method, 0) + 1
+        entries.append({"path": rel_path, "existed": True, "method": method, "bytes": os.path.getsize(dst)})
+
+    manifest = {
+        "job_id": job_id,
+        "world": world,
+        "world_dir": os.path.abspath(world_dir),
+        "created_at": time.time(),
+        "seconds": round(time.perf_counter() - started, 3),
+        "methods": methods,
+        "entries": entries,
+    }
+    _write_manifest(job_id, manifest)
+    prune_snapshots()
+    return snapshot_summary(manifest)
+
+
+def _list_manifests():
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    manifests = []
+    for name in os.listdir(JOBS_DIR):
+        if is_valid_job_id(name):
+            manifest = read_snapshot_manifest(name)
+            if manifest is not None:
+                manifests.append(manifest)
+    manifests.sort(key=lambda m: m["created_at"], reverse=True)
+    return manifests
+
+
+def delete_snapshot(job_id):
+    shutil.rmtree(os.path.join(job_dir(job_id), SNAPSHOT_FILES_DIR), ignore_errors=True)
+    try:
+        os.remove(_manifest_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+def prune_snapshots(keep=None):
+    """Deletes all but the `keep` (default SNAPSHOT_RETENTION) newest snapshots."""
+    keep = SNAPSHOT_RETENTION if keep is None else keep
+    for manifest in _list_manifests()[keep:]:
+        delete_snapshot(manifest["job_id"])
+
+
+def conflicting_jobs(job_id):
+    """
+    Later jobs into the same world, not rolled back, whose snapshots cover region
+    files this job's snapshot also covers. Rolling back `job_id` first would discard their changes.
+    """
+    manifest = read_snapshot_manifest(job_id)
+    if manifest is None:
+        return []
+    paths = {entry["path"] for entry in manifest["entries"] if entry["path"] != "level.dat"}
+    return [
+        other["job_id"] for other in _list_manifests()
+        if other["created_at"] > manifest["created_at"] and not other.get("rolled_back_at")
+        and other["world_dir"] == manifest["world_dir"]
+        and paths.intersection(entry["path"] for entry in other["entries"])
+    ]
+
+
+def rollback_snapshot(job_id):
+    """
+    Puts the files preserved for `job_id` back into the world and deletes files the
+    job created. The caller must hold the world lock. Returns the rollback summary.
+    """
+    started = time.perf_counter()
+    manifest = read_snapshot_manifest(job_id)
+    files_dir = os.path.join(job_dir(job_id), SNAPSHOT_FILES_DIR)
+    restored, deleted, methods = 0, 0, {}
+    for entry in manifest["entries"]:
+        target = os.path.join(manifest["world_dir"], entry["path"])
+        if entry["existed"]:
+            method = _restore(os.path.join(files_dir, entry["path"]), target)
+            methods[method] = methods.get(method, 0) + 1
+            restored += 1
+        elif os.path.exists(target):
+            os.remove(target)
+            deleted += 1
+
+    shutil.rmtree(files_dir, ignore_errors=True)
+    manifest["rolled_back_at"] = time.time()
+    manifest["rollback"] = {
+        "restored_files": restored,
+        "deleted_files": deleted,
+        "methods": methods,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    _write_manifest(job_id, manifest)
+    logger.info(f"Rolled back job {job_id}: restored {restored} files, deleted {deleted}")
+    return manifest["rollback"]
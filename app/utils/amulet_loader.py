@@ -0,0 +1,69 @@
+"""
+app/utils/amulet_loader.py
+
+Deferred import of Amulet. `import amulet` loads PyMCTranslate's translation
+database, which takes most of a second, so nothing on the startup path imports it.
+The merge worker calls load_amulet() when it first needs to open a world, and
+prewarm_amulet() can do the import on a background thread ahead of time. The
+import time is reported as the "amulet" phase of worldsync_startup_seconds.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_amulet = None
+_load_lock = threading.Lock()
+# PyMCTranslate fills a process-wide cache while building a translation manager and
+# breaks if two threads build one at once (e.g. the prewarm thread and the first merge).
+# Translating chunks needs no lock: that cache is only written while a manager is built,
+# and the translators (with their block caches) it loads later belong to one level's
+# manager, which only the worker merging that level uses. Concurrent merges of
+# different worlds therefore never share mutable translation state.
+_translation_lock = threading.Lock()
+
+
+def load_amulet():
+    """Returns the amulet module, importing it on first use. Safe to call from any thread."""
+    global _amulet
+    if _amulet is not None:
+        return _amulet
+    with _load_lock:
+        if _amulet is None:
+            from app.utils.metrics import STARTUP_SECONDS
+            start = time.perf_counter()
+            import amulet
+            load_seconds = time.perf_counter() - start
+            _amulet = amulet
+            STARTUP_SECONDS.set(round(load_seconds, 4), phase="amulet")
+            logger.info(f"Loaded Amulet in {load_seconds:.2f}s")
+    return _amulet
+
+
+def load_level(path):
+    """amulet.load_level with the level's translation manager built up front, one thread at a time."""
+    level = load_amulet().load_level(path)
+    with _translation_lock:
+        level.translation_manager  # built lazily by the property otherwise, mid-merge
+    return level
+
+
+def _prewarm():
+    try:
+        load_amulet()
+        # Each world builds its own translation manager; doing one now pulls the
+        # translation files into the OS cache before the first merge needs them
+        import PyMCTranslate
+        with _translation_lock:
+            PyMCTranslate.new_translation_manager()
+    except Exception as e:
+        logger.warning(f"Amulet prewarm failed; it will load on the first merge instead: {e}")
+
+
+def prewarm_amulet():
+    """Starts importing Amulet on a daemon thread; returns the thread."""
+    thread = threading.Thread(target=_prewarm, name="amulet-prewarm", daemon=True)
+    thread.start()
+    return thread
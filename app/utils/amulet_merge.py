@@ -4,7 +4,17 @@ app/utils/amulet_merge.py
 Contains helper functions for merging worlds using Amulet.
 """
 
-from amulet.api.errors import ChunkLoadError, ChunkDoesNotExist
+# amulet is imported inside the functions that need it (they are only handed
+# already-loaded worlds), so importing this module stays cheap; see amulet_loader
+
+# Uploaded dimension names that are stored under a different name in the local world
+DIMENSION_REMAP = {
+    "minecraft:ultra_space": "pixelmon:ultra_space",
+}
+
+def remap_dimension(dimension):
+    """Name of the local-world dimension that uploaded `dimension` merges into."""
+    return DIMENSION_REMAP.get(dimension, dimension)
 
 def merge_amulet_worlds(uploaded_world, local_world, progress_callback=None):
     """
@@ -17,13 +27,11 @@ def merge_amulet_worlds(uploaded_world, local_world, progress_callback=None):
     Returns:
         A list of tuples (effective_dimension, chunk_x, chunk_z) for each merged chunk.
     """
+    from amulet.api.errors import ChunkLoadError, ChunkDoesNotExist
+
     merged_chunks = []
     for dimension in uploaded_world.dimensions:
-        # Remap "minecraft:ultra_space" -> "pixelmon:ultra_space"
-        if dimension == "minecraft:ultra_space":
-            effective_dimension = "pixelmon:ultra_space"
-        else:
-            effective_dimension = dimension
+        effective_dimension = remap_dimension(dimension)
 
         coords = list(uploaded_world.all_chunk_coords(dimension))
         for (cx, cz) in coords:
@@ -38,6 +46,25 @@ def merge_amulet_worlds(uploaded_world, local_world, progress_callback=None):
                     progress_callback(len(merged_chunks))
     return merged_chunks
 
+def count_mergeable_chunks(world):
+    """
+    Counts the chunks merge_amulet_worlds would write from `world`: every chunk
+    that loads and is not empty. Used to size progress reporting before a merge.
+    """
+    from amulet.api.errors import ChunkLoadError, ChunkDoesNotExist
+
+    total = 0
+    for dimension in world.dimensions:
+        coords = list(world.all_chunk_coords(dimension))
+        for (cx, cz) in coords:
+            try:
+                chunk = world.get_chunk(cx, cz, dimension)
+            except (ChunkLoadError, ChunkDoesNotExist):
+                continue
+            if not is_chunk_empty(chunk):
+                total += 1
+    return total
+
 def is_chunk_empty(chunk):
     """Basic check if chunk is 'empty' (no block data)."""
     if chunk is None:
@@ -10,19 +10,27 @@ from app.utils.rcon_helper import bluemap_reload
 
 logger = logging.getLogger(__name__)
 
-def sync_waypoints_bluemap(all_waypoints):
+def sync_waypoints_bluemap(all_waypoints, target=None):
+    """
+    Writes the warp marker set into each dimension's BlueMap .conf and reloads
+    BlueMap. `target` is the WorldTarget whose BlueMap gets the markers; None uses
+    the single-world settings.
+    """
+    maps_path = target.bluemap_maps_path if target is not None else BLUEMAP_MAPS_PATH
+    dimension_confs = target.dimension_bluemap_confs if target is not None else DIMENSION_TO_BLUEMAP_CONF
+
     dimension_map = {}
     for wp in all_waypoints:
         dim = wp.get('dimension')
         dimension_map.setdefault(dim, []).append(wp)
 
     for dim, wps in dimension_map.items():
-        conf_filename = DIMENSION_TO_BLUEMAP_CONF.get(dim)
+        conf_filename = dimension_confs.get(dim)
         if not conf_filename:
             logger.warning(f"No BlueMap .conf for dimension '{dim}'")
             continue
 
-        conf_path = os.path.join(BLUEMAP_MAPS_PATH, conf_filename)
+        conf_path = os.path.join(maps_path, conf_filename)
         if not os.path.isfile(conf_path):
             logger.warning(f"Config not found: {conf_path}")
             continue
@@ -37,7 +45,7 @@ def sync_waypoints_bluemap(all_waypoints):
 
         logger.info(f"Synced {len(wps)} waypoints to {conf_filename}")
 
-    bluemap_reload()
+    bluemap_reload(target)
 
 def update_conf_with_waypoints(conf_lines, waypoints):
     """
@@ -1,53 +1,140 @@
 # app/utils/compressed_rotating_handler.py
 import os
+import re
+import sys
+import queue
+import atexit
 import logging
 import zipfile
+import threading
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
 from dateutil import tz
 
+# Rotated logs waiting for compression: (rotated_path, archive_path, arcname, base_filename, backup_count)
+_compression_queue = queue.Queue()
+_compression_thread = None
+_compression_lock = threading.Lock()
+
+
+def _compression_worker():
+	while True:
+		rotated_path, archive_path, arcname, base_filename, backup_count = _compression_queue.get()
+		try:
+			with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+				zipf.write(rotated_path, arcname=arcname)
+			os.remove(rotated_path)
+			_prune_archives(base_filename, backup_count)
+		except Exception as e:
+			# Logging from here could feed back into the handler being rotated
+			print(f"Failed to compress rotated log {rotated_path}: {e}", file=sys.stderr, flush=True)
+		finally:
+			_compression_queue.task_done()
+
+
+def _start_compression(rotated_path, archive_path, arcname, base_filename, backup_count):
+	"""Queues a rotated log for compression on the background thread, starting it if needed."""
+	global _compression_thread
+	with _compression_lock:
+		if _compression_thread is None or not _compression_thread.is_alive():
+			_compression_thread = threading.Thread(target=_compression_worker, name="log-compressor", daemon=True)
+			_compression_thread.start()
+	_compression_queue.put((rotated_path, archive_path, arcname, base_filename, backup_count))
+
+
+def wait_for_compression(timeout=None):
+	"""Blocks until queued archives are written (or `timeout` seconds pass); returns True if drained."""
+	done = threading.Event()
+	threading.Thread(target=lambda: (_compression_queue.join(), done.set()), daemon=True).start()
+	return done.wait(timeout)
+
+
+def _reset_after_fork():
+	global _compression_queue, _compression_thread, _compression_lock
+	_compression_queue = queue.Queue()
+	_compression_thread = None
+	_compression_lock = threading.Lock()
+
+
+def _prune_archives(base_filename, backup_count):
+	"""Deletes the oldest archives of `base_filename` beyond `backup_count` (0 keeps everything)."""
+	if backup_count <= 0:
+		return
+	directory = os.path.dirname(base_filename)
+	archives = [os.path.join(directory, name) for name in os.listdir(directory)
+				if _archive_pattern(base_filename).match(name)]
+	archives.sort(key=lambda path: (os.path.getmtime(path), path))
+	for path in archives[:-backup_count]:
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+
+
+def _rotated_pattern(base_filename):
+	return re.compile(re.escape(os.path.basename(base_filename)) + r"\.\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(-\d+)?$")
+
+
+def _archive_pattern(base_filename):
+	return re.compile(re.escape(os.path.basename(base_filename)) + r"\.\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(-\d+)?\.zip$")
+
+
+atexit.register(wait_for_compression, 10)
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 class CompressedRotatingFileHandler(RotatingFileHandler):
+	"""
+	RotatingFileHandler whose rollover only renames the log; zipping it and pruning
+	archives beyond backupCount happen on a background thread, so the thread that
+	crossed maxBytes is not held up by compression.
+	"""
+
 	def __init__(self, filename, mode='a', maxBytes=0, backupCount=0, encoding=None, delay=False):
 		# Create logs directory if needed
 		os.makedirs(os.path.dirname(filename), exist_ok=True)
 
-		# Rotate existing log on startup
+		# Rotate existing log on startup, and finish any rotation a previous run left uncompressed
+		self._compress_leftovers(os.path.abspath(filename), backupCount)
 		if os.path.exists(filename):
-			self._rotate_on_startup(filename)
+			self._rotate(os.path.abspath(filename), backupCount)
 
 		super().__init__(filename, mode, maxBytes, backupCount, encoding, delay)
 
-	def _rotate_on_startup(self, filename):
-		"""Rotate and compress existing log file on application start"""
+	@staticmethod
+	def _rotate(base_filename, backup_count):
+		"""Renames the log out of the way and queues it for compression."""
 		timestamp = datetime.now(tz=tz.gettz()).strftime('%Y-%m-%d_%H-%M-%S')
-		base_name = os.path.basename(filename)
-		archive_name = f"{base_name}.{timestamp}.zip"
-		archive_path = os.path.join(os.path.dirname(filename), archive_name)
+		rotated_path = f"{base_filename}.{timestamp}"
+		suffix = 0
+		while os.path.exists(rotated_path) or os.path.exists(f"{rotated_path}.zip"):
+			suffix += 1
+			rotated_path = f"{base_filename}.{timestamp}-{suffix}"
 
-		with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-			zipf.write(filename, arcname=base_name)
+		os.rename(base_filename, rotated_path)
+		_start_compression(rotated_path, f"{rotated_path}.zip", os.path.basename(base_filename),
+						   base_filename, backup_count)
 
-		os.remove(filename)
+	@staticmethod
+	def _compress_leftovers(base_filename, backup_count):
+		directory = os.path.dirname(base_filename)
+		if not os.path.isdir(directory):
+			return
+		pattern = _rotated_pattern(base_filename)
+		for name in sorted(os.listdir(directory)):
+			if pattern.match(name):
+				rotated_path = os.path.join(directory, name)
+				_start_compression(rotated_path, f"{rotated_path}.zip", os.path.basename(base_filename),
+								   base_filename, backup_count)
 
 	def doRollover(self):
-		"""Rotate and compress when maxBytes is reached"""
+		"""Rotate when maxBytes is reached; compression happens in the background"""
 		if self.stream:
 			self.stream.close()
 			self.stream = None
 
-		timestamp = datetime.now(tz=tz.gettz()).strftime('%Y-%m-%d_%H-%M-%S')
-		base_name = os.path.basename(self.baseFilename)
-		archive_name = f"{base_name}.{timestamp}.zip"
-		archive_path = os.path.join(os.path.dirname(self.baseFilename), archive_name)
-
-		# Compress current log
-		with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-			zipf.write(self.baseFilename, arcname=base_name)
-
-		# Remove original log file
 		if os.path.exists(self.baseFilename):
-			os.remove(self.baseFilename)
+			self._rotate(self.baseFilename, self.backupCount)
 
 		# Create new log file
 		if not self.delay:
@@ -0,0 +1,121 @@
+"""
+app/utils/json_stream.py
+
+Incremental parsing of a top-level JSON array from a byte stream, so large
+request bodies can be consumed item by item without loading them whole.
+"""
+
+import codecs
+import json
+
+READ_CHUNK_SIZE = 64 * 1024
+# Largest single array element accepted; bounds the buffer on hostile input
+MAX_ELEMENT_SIZE = 1024 * 1024
+# A decode error this close to the end of the buffer may just be a truncated
+# token (a literal like "tru" or an escape like "\u00"); more data can fix it
+_TRUNCATION_SLACK = 16
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _Buffer:
+    """Decoded text read from `stream` on demand, with a cursor into it."""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Reads one more chunk; returns False once the stream is exhausted."""
+        if self.eof:
+            return False
+        data = self.stream.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            self.text += self.utf8.decode(b'', final=True)
+            return False
+        # Drop consumed text so the buffer stays around one item + one chunk in size
+        self.text = self.text[self.pos:] + self.utf8.decode(data)
+        self.pos = 0
+        return True
+
+    def next_char(self):
+        """Skips whitespace and returns the next character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _delimited(text, pos):
+    """True if the next non-whitespace character at or after `pos` is ',' or ']'."""
+    while pos < len(text) and text[pos] in _WHITESPACE:
+        pos += 1
+    return pos < len(text) and text[pos] in ',]'
+
+
+def _maybe_truncated(err, text):
+    """True if `err` could be caused by the element continuing past the end of `text`."""
+    return err.msg.startswith("Unterminated string") or len(text) - err.pos < _TRUNCATION_SLACK
+
+
+def _fill_element(buf, max_element_size):
+    """buf.fill() for an element still being read; raises once it outgrows `max_element_size`."""
+    if len(buf.text) - buf.pos > max_element_size:
+        raise ValueError(f"JSON list element longer than {max_element_size} characters")
+    return buf.fill()
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE, max_element_size=MAX_ELEMENT_SIZE):
+    """
+    Yields the elements of a JSON array read incrementally from a binary `stream`.
+    Raises ValueError if the body is not a well-formed JSON array or an element is
+    longer than `max_element_size` characters.
+    """
+    buf = _Buffer(stream, chunk_size)
+    if buf.next_char() != '[':
+        raise ValueError("Expected a JSON list")
+    buf.pos += 1
+
+    if buf.next_char() == ']':
+        buf.pos += 1
+        return
+
+    while True:
+        if buf.next_char() == '':
+            raise ValueError("Unexpected end of JSON list")
+        while True:
+            try:
+                item, end = _decoder.raw_decode(buf.text, buf.pos)
+            except json.JSONDecodeError as err:
+                # Possibly an element split across reads; retry with more data
+                if _maybe_truncated(err, buf.text) and _fill_element(buf, max_element_size):
+                    continue
+                raise ValueError(f"Malformed JSON list element: {err.msg}")
+            # A number is only complete once a delimiter follows it; "12" may be "12.5"
+            if _is_number(item) and not _delimited(buf.text, end) and _fill_element(buf, max_element_size):
+                continue
+            break
+        buf.pos = end
+        yield item
+
+        delimiter = buf.next_char()
+        buf.pos += 1
+        if delimiter == ']':
+            if buf.next_char() != '':
+                raise ValueError("Unexpected data after JSON list")
+            return
+        if delimiter != ',':
+            raise ValueError("Expected ',' or ']' in JSON list")
@@ -0,0 +1,121 @@
+"""
+app/utils/log_pipeline.py
+
+Queue-based logging so that emitting a record never waits on disk I/O or on log
+rotation. Loggers get a NonBlockingQueueHandler; a QueueListener thread feeds the
+real handlers (files, console). When the queue is full, records are dropped and
+counted rather than blocking the emitter.
+
+Also holds LogRateLimiter for sampling high-volume sources such as BlueMap output.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from app.utils.metrics import LOG_RECORDS_DROPPED
+
+DEFAULT_QUEUE_SIZE = 10000
+
+_pipelines = []
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+class _Pipeline:
+    def __init__(self, handlers, max_size):
+        self.handlers = handlers
+        self.max_size = max_size
+        self.queue_handler = NonBlockingQueueHandler(queue.Queue(max_size))
+        self.listener = None
+
+    def start(self):
+        self.listener = QueueListener(self.queue_handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_in_child(self):
+        # The listener thread does not survive fork(); the queue's locks may have been
+        # held by it mid-operation, so the child starts over with a fresh queue.
+        self.queue_handler.queue = queue.Queue(self.max_size)
+        self.start()
+
+
+def start_queue_logging(handlers, max_size=DEFAULT_QUEUE_SIZE):
+    """
+    Starts a listener thread writing to `handlers` and returns the handler to attach
+    to loggers in their place. Records queued at exit are flushed by an atexit hook,
+    and forked children (gunicorn workers) get their own listener automatically.
+    """
+    pipeline = _Pipeline(list(handlers), max_size)
+    pipeline.start()
+    _pipelines.append(pipeline)
+    return pipeline.queue_handler
+
+
+def stop_queue_logging(queue_handler=None):
+    """Stops the pipeline behind `queue_handler` (all pipelines if None), flushing queued records."""
+    for pipeline in list(_pipelines):
+        if queue_handler is None or pipeline.queue_handler is queue_handler:
+            pipeline.stop()
+            _pipelines.remove(pipeline)
+
+
+def _restart_after_fork():
+    for pipeline in _pipelines:
+        pipeline.restart_in_child()
+
+
+atexit.register(stop_queue_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+class LogRateLimiter:
+    """
+    Per-key token bucket: allows `burst` records at once, then one every `interval`
+    seconds. An interval of 0 or less disables limiting.
+
+    check() returns None when the record should be skipped, otherwise the number of
+    records suppressed for that key since the last one allowed, so callers can say so.
+    """
+
+    def __init__(self, interval, burst=1):
+        self.interval = interval
+        self.burst = max(burst, 1)
+        self.total_suppressed = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def check(self, key, force=False):
+        if self.interval <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated) / self.interval)
+            if tokens < 1 and not force:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                self.total_suppressed += 1
+                return None
+            self._buckets[key] = (max(tokens - 1, 0), now, 0)
+            return suppressed
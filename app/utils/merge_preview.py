@@ -0,0 +1,172 @@
+"""
+app/utils/merge_preview.py
+
+Estimates what a merge will touch without running it. Only the location table
+of each .mca file in the upload (its first 4 KiB) is read, straight out of the
+archive; no chunk is decompressed or decoded. Those tables are compared against the
+matching local region files to split chunks into new and overwritten, and stage
+durations are projected from the per-chunk rates of recent jobs. Both sides count
+chunks the same way, as entries present in the location tables (see
+count_present_chunks), whether or not the chunk turns out to be empty.
+"""
+
+import os
+import statistics
+
+from app.utils.amulet_merge import remap_dimension
+from app.utils.archive_extract import read_member_heads
+from app.utils.region_file import (
+    SECTOR_SIZE,
+    dimension_region_dir,
+    parse_location_table,
+    present_chunk_indices,
+    read_location_table,
+    region_coords,
+    region_dir_dimension,
+    region_file_name,
+)
+
+# Projected stages, as the job stages (see WorldWorker.job_stage) they are made of
+PROJECTED_STAGES = {
+    "merge": ("extract", "world_load", "count", "merge", "snapshot", "save"),
+    "relight": ("relight",),
+    "render": ("bluemap_render",),
+}
+
+
+def _member_name(name):
+    """Archive member name without the leading './' tar adds for `tar -C world .`."""
+    while name.startswith("./"):
+        name = name[2:]
+    return name
+
+
+def _world_root(names):
+    """Folder inside the archive holding level.dat ('' for the archive root)."""
+    roots = [name[:-len("level.dat")] for name in names if name == "level.dat" or name.endswith("/level.dat")]
+    return min(roots, key=len) if roots else ""
+
+
+def scan_archive_regions(archive_path):
+    """
+    Reads the location tables of the region files in a world archive (any format
+    archive_extract supports). Returns {dimension: {(rx, rz): array of present
+    chunk indices}}, keyed by the uploaded dimension name.
+    """
+    names, headers = read_member_heads(archive_path, ".mca", SECTOR_SIZE)
+    root = _world_root([_member_name(name) for name in names])
+    regions = {}
+    for name, header in headers.items():
+        name = _member_name(name)
+        if not name.startswith(root):
+            continue
+        region_dir, _, filename = name[len(root):].rpartition("/")
+        dimension = region_dir_dimension(region_dir)
+        coords = region_coords(filename)
+        if dimension is None or coords is None:
+            continue
+        regions.setdefault(dimension, {})[coords] = present_chunk_indices(parse_location_table(header))
+    return regions
+
+
+def count_present_chunks(world_dir):
+    """
+    Chunks present in the location tables of a world's region files, across every
+    dimension: the count scan_archive_regions gives for the same world as an archive.
+    """
+    total = 0
+    for root, _, files in os.walk(world_dir):
+        if region_dir_dimension(os.path.relpath(root, world_dir)) is None:
+            continue
+        for name in files:
+            if region_coords(name) is not None:
+                total += len(present_chunk_indices(read_location_table(os.path.join(root, name))))
+    return total
+
+
+def compare_with_local(regions, local_world_dir):
+    """Per-dimension region and chunk counts for `regions`, split into new and overwritten against the local world."""
+    dimensions = {}
+    for dimension, tables in sorted(regions.items()):
+        local_dimension = remap_dimension(dimension)
+        local_region_dir = os.path.join(local_world_dir, dimension_region_dir(local_dimension))
+        summary = {
+            "local_dimension": local_dimension,
+            "regions": 0,
+            "new_regions": 0,
+            "chunks": 0,
+            "new_chunks": 0,
+            "overwritten_chunks": 0,
+        }
+        for (rx, rz), uploaded in tables.items():
+            if not len(uploaded):
+                continue
+            summary["regions"] += 1
+            summary["chunks"] += len(uploaded)
+            local_path = os.path.join(local_region_dir, region_file_name(rx, rz))
+            if os.path.isfile(local_path):
+                local_table = read_location_table(local_path)
+                overwritten = int((local_table[uploaded] != 0).sum())
+            else:
+                summary["new_regions"] += 1
+                overwritten = 0
+            summary["overwritten_chunks"] += overwritten
+            summary["new_chunks"] += len(uploaded) - overwritten
+        dimensions[dimension] = summary
+    return dimensions
+
+
+def stage_rates(records):
+    """
+    Median seconds per present chunk (see count_present_chunks) of each projected
+    stage over successful job records. Records without present_chunks (jobs from
+    before it was recorded) are skipped: their total_chunks leaves out empty chunks,
+    which the preview counts. Returns {stage: {"seconds_per_chunk": float or None, "samples": n}}.
+    """
+    samples = {stage: [] for stage in PROJECTED_STAGES}
+    for record in records:
+        chunks = record.get("present_chunks")
+        stage_seconds = record.get("stage_seconds") or {}
+        if record.get("result") != "success" or not chunks:
+            continue
+        for stage, job_stages in PROJECTED_STAGES.items():
+            # Jobs from before a stage existed (or with it disabled) count it as zero
+            if any(name in stage_seconds for name in job_stages):
+                samples[stage].append(sum(stage_seconds.get(name, 0) for name in job_stages) / chunks)
+    return {
+        stage: {
+            "seconds_per_chunk": statistics.median(values) if values else None,
+            "samples": len(values),
+        }
+        for stage, values in samples.items()
+    }
+
+
+def project_durations(chunks, rates):
+    """Projected seconds per stage for merging `chunks` chunks; None where there is no history."""
+    projection = {}
+    for stage, rate in rates.items():
+        per_chunk = rate["seconds_per_chunk"]
+        projection[stage] = {
+            "seconds": round(per_chunk * chunks, 1) if per_chunk is not None else None,
+            "seconds_per_chunk": round(per_chunk, 6) if per_chunk is not None else None,
+            "samples": rate["samples"],
+        }
+    known = [stage["seconds"] for stage in projection.values() if stage["seconds"] is not None]
+    projection["total_seconds"] = round(sum(known), 1) if len(known) == len(rates) else None
+    return projection
+
+
+def preview_merge(archive_path, local_world_dir, records):
+    """Full preview for a world archive: per-dimension counts, totals and projected stage durations."""
+    dimensions = compare_with_local(scan_archive_regions(archive_path), local_world_dir)
+    totals = {
+        key: sum(summary[key] for summary in dimensions.values())
+        for key in ("regions", "new_regions", "chunks", "new_chunks", "overwritten_chunks")
+    }
+    return {
+        "archive_bytes": os.path.getsize(archive_path),
+        "dimensions": dimensions,
+        "totals": totals,
+        "projection": project_durations(totals["chunks"], stage_rates(records)),
+    }
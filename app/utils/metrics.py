@@ -0,0 +1,197 @@
+"""
+app/utils/metrics.py
+
+Minimal in-process metrics (counters, gauges, histograms) rendered in the
+Prometheus text exposition format for the /metrics endpoint.
+
+Everything is recorded at stage / request / command granularity; nothing here
+should be called from per-chunk loops.
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+# Buckets in seconds, from a single RCON call up to a multi-hour render
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+                   120, 300, 600, 1200, 1800, 3600, 7200)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_metrics = []
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values = {}
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A gauge that is either set directly or read from `callback` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        if self._callback is not None:
+            self.set(self._callback())
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall time of the `with` block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics():
+    """Returns all registered metrics in Prometheus text format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Merge pipeline
+MERGE_STAGE_SECONDS = Histogram(
+    "worldsync_merge_stage_seconds",
+    "Duration of each merge pipeline stage, per world.",
+    ["stage", "world"],
+)
+MERGE_JOBS = Counter("worldsync_merge_jobs_total", "Merge jobs finished, by result and world.", ["result", "world"])
+MERGE_CHUNKS = Counter("worldsync_merged_chunks_total", "Chunks written into the local world, per world.", ["world"])
+MERGE_QUEUE_WAIT_SECONDS = Histogram(
+    "worldsync_merge_queue_wait_seconds",
+    "Time merge jobs spent queued before the worker picked them up.",
+)
+EXTRACT_THROUGHPUT = Histogram(
+    "worldsync_extract_megabytes_per_second",
+    "Extracted megabytes per second of each uploaded archive, by archive format.",
+    ["format"],
+    buckets=(5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+BYTES_PROCESSED = Counter(
+    "worldsync_bytes_processed_total",
+    "Bytes handled, by kind (upload, extracted, waypoint_request).",
+    ["kind"],
+)
+
+# RCON
+RCON_COMMAND_SECONDS = Histogram(
+    "worldsync_rcon_command_seconds",
+    "Duration of RCON commands, including connect and login.",
+    ["command", "world"],
+)
+RCON_ERRORS = Counter("worldsync_rcon_errors_total", "RCON commands that raised.", ["command", "world"])
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    "worldsync_http_request_seconds",
+    "Request latency of instrumented endpoints.",
+    ["endpoint", "method", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+
+# Logging
+LOG_RECORDS_DROPPED = Counter(
+    "worldsync_log_records_dropped_total",
+    "Log records dropped because the logging queue was full.",
+)
+
+# Startup
+STARTUP_SECONDS = Gauge(
+    "worldsync_startup_seconds",
+    "Time spent in each phase of app initialisation.",
+    ["phase"],
+)
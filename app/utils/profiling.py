@@ -0,0 +1,170 @@
+"""
+app/utils/profiling.py
+
+On-demand profiling of a single merge job: cProfile over the worker thread plus
+tracemalloc allocation tracking. Stages record cheap traced-memory counters; the
+top allocation sites come from heap snapshots sampled every few seconds on a
+separate thread rather than around every stage, which would cost two whole-heap
+snapshots per stage. Only constructed for jobs that asked for it, so unprofiled
+jobs pay nothing.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILE = "profile.prof"
+PROFILE_SUMMARY_FILE = "profile.txt"
+ALLOCATIONS_FILE = "allocations.json"
+
+# tracemalloc does not record which thread allocated, so allocations made while serving
+# requests, logging or sampling are dropped by the code they come from: a trace is left
+# out if any frame it kept matches. More PROFILE_TRACEMALLOC_FRAMES separate them better.
+NON_WORKER_CODE = (
+    "*/flask/*",
+    "*/werkzeug/*",
+    "*/gunicorn/*",
+    "*/marshmallow/*",
+    "*/logging/*",
+    "*/app/routes/*",
+    "*/app/utils/json_stream.py",
+    "*/app/utils/spatial_index.py",
+    "*/app/utils/bluemap_helper.py",
+    "*/app/utils/log_pipeline.py",
+    "*/app/utils/compressed_rotating_handler.py",
+    tracemalloc.__file__,
+    __file__,
+)
+
+
+class JobProfiler:
+    """
+    Context manager that profiles the calling thread and writes its results to
+    `output_dir`:
+      profile.prof      raw cProfile stats (load with pstats / snakeviz)
+      profile.txt       top functions by cumulative time
+      allocations.json  per stage: duration, net and peak traced memory; per sample
+                        (every `sample_seconds`, and once at the end): the stage
+                        running and the top allocation sites by net size allocated
+                        since the previous sample, request-handling code excluded
+
+    `frames` is the traceback depth tracemalloc keeps per allocation; 1 keeps
+    overhead lowest, higher values attribute allocations to their callers.
+    """
+
+    def __init__(self, output_dir, frames=1, top_n=25, sample_seconds=10.0):
+        self.output_dir = output_dir
+        self.frames = frames
+        self.top_n = top_n
+        self.sample_seconds = sample_seconds
+        self._profile = cProfile.Profile()
+        self._stages = []
+        self._open_stages = {}
+        self._current_stage = None
+        self._samples = []
+        self._sites = {}
+        self._filters = [tracemalloc.Filter(False, pattern, all_frames=True) for pattern in NON_WORKER_CODE]
+        self._stop_sampling = threading.Event()
+        self._sampler = None
+        self._started = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracemalloc = True
+        self._started = time.perf_counter()
+        self._sites = self._site_sizes()
+        self._sampler = threading.Thread(target=self._sample_loop, name="job-profiler-sampler", daemon=True)
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def begin_stage(self, name):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        self._open_stages[name] = (time.perf_counter(), current)
+        self._current_stage = name
+
+    def end_stage(self, name):
+        started, traced_before = self._open_stages.pop(name)
+        current, peak = tracemalloc.get_traced_memory()
+        self._stages.append({
+            "stage": name,
+            "seconds": round(time.perf_counter() - started, 3),
+            "traced_bytes_diff": current - traced_before,
+            "peak_traced_bytes": peak,
+        })
+
+    def _site_sizes(self):
+        """{allocation site: (bytes, blocks)} of the traced heap, worker allocations only."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+        stats = snapshot.statistics("traceback" if self.frames > 1 else "lineno")
+        return {
+            tuple(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback): (stat.size, stat.count)
+            for stat in stats
+        }
+
+    def _sample(self):
+        sites = self._site_sizes()
+        previous, self._sites = self._sites, sites
+        changes = []
+        for site in sites.keys() | previous.keys():
+            size, count = sites.get(site, (0, 0))
+            old_size, old_count = previous.get(site, (0, 0))
+            if size != old_size:
+                changes.append({
+                    "site": list(site),
+                    "size_diff_bytes": size - old_size,
+                    "count_diff": count - old_count,
+                    "size_bytes": size,
+                })
+        changes.sort(key=lambda change: abs(change["size_diff_bytes"]), reverse=True)
+        self._samples.append({
+            "at_seconds": round(time.perf_counter() - self._started, 1),
+            "stage": self._current_stage,
+            "top_allocations": changes[:self.top_n],
+        })
+
+    def _sample_loop(self):
+        while not self._stop_sampling.wait(self.sample_seconds):
+            self._sample()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        self._stop_sampling.set()
+        self._sampler.join()
+        self._sample()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        try:
+            self._write()
+        except OSError as e:
+            logger.error(f"Failed to write profile to {self.output_dir}: {e}", exc_info=True)
+        return False
+
+    def _write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._profile.dump_stats(os.path.join(self.output_dir, PROFILE_FILE))
+
+        summary = io.StringIO()
+        pstats.Stats(self._profile, stream=summary).sort_stats("cumulative").print_stats(60)
+        with open(os.path.join(self.output_dir, PROFILE_SUMMARY_FILE), "w") as f:
+            f.write(summary.getvalue())
+
+        with open(os.path.join(self.output_dir, ALLOCATIONS_FILE), "w") as f:
+            json.dump({
+                "tracemalloc_frames": self.frames,
+                "sample_seconds": self.sample_seconds,
+                "stages": self._stages,
+                "samples": self._samples,
+            }, f, indent=4)
+        logger.info(f"Wrote job profile to {self.output_dir}")
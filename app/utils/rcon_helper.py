@@ -2,63 +2,95 @@
 app/utils/rcon_helper.py
 
 Provides a context manager for interacting with the server via RCON,
-plus functions to control BlueMap and to recalculate chunk lighting.
+plus functions to control BlueMap, to recalculate chunk lighting, and to tell
+whether the server is up.
 """
 
 import logging
+import socket
 from rcon import Client
 from app.config import RCON_HOST, RCON_PORT, RCON_PASSWORD
+from app.utils.metrics import RCON_COMMAND_SECONDS, RCON_ERRORS
 
-def rcon_client():
+def rcon_client(target=None):
     """
     A context manager for establishing an RCON client connection,
-    closing it automatically after use.
+    closing it automatically after use. `target` is a WorldTarget; None uses
+    the single-world RCON settings.
     """
-    return Client(host=RCON_HOST, port=RCON_PORT, passwd=RCON_PASSWORD)
+    if target is None:
+        return Client(host=RCON_HOST, port=RCON_PORT, passwd=RCON_PASSWORD)
+    return Client(host=target.rcon_host, port=target.rcon_port, passwd=target.rcon_password)
 
-def bluemap_reload():
+def run_command(command, target=None):
+    """
+    Runs a single RCON command on a fresh connection and returns the response,
+    recording its duration (and any failure) under the command's first two words.
+    """
+    label = " ".join(command.split()[:2])
+    world = target.name if target is not None else ""
+    try:
+        with RCON_COMMAND_SECONDS.time(command=label, world=world):
+            with rcon_client(target) as client:
+                return client.run(command)
+    except Exception:
+        RCON_ERRORS.inc(command=label, world=world)
+        raise
+
+def server_reachable(target=None, timeout=2.0):
+    """
+    True if something accepts connections on the RCON port, i.e. the server is
+    running. Only connects; does not log in or run a command.
+    """
+    if target is None:
+        address = (RCON_HOST, RCON_PORT)
+    else:
+        address = (target.rcon_host, target.rcon_port)
+    try:
+        with socket.create_connection(address, timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def bluemap_reload(target=None):
     """
     Instructs the Minecraft server to reload BlueMap's configuration.
     This picks up any changes we've made to the marker .conf files.
     """
     try:
-        with rcon_client() as client:
-            response = client.run("bluemap reload light")
-            logging.info(f"Executed bluemap reload -> Response: {response}")
+        response = run_command("bluemap reload light", target)
+        logging.info(f"Executed bluemap reload -> Response: {response}")
     except Exception as e:
         logging.error(f"Failed to reload BlueMap via RCON: {e}", exc_info=True)
 
-def bluemap_stop():
+def bluemap_stop(target=None):
     """
     Disables BlueMap to prevent rendering issues during world merging.
     """
     try:
-        with rcon_client() as client:
-            response = client.run("bluemap stop")
-            logging.info(f"Executed bluemap stop -> Response: {response}")
+        response = run_command("bluemap stop", target)
+        logging.info(f"Executed bluemap stop -> Response: {response}")
     except Exception as e:
         logging.error(f"Failed to stop BlueMap via RCON: {e}", exc_info=True)
 
-def bluemap_start():
+def bluemap_start(target=None):
     """
     Re-enables BlueMap after world merging and lighting recalculations are complete.
     """
     try:
-        with rcon_client() as client:
-            response = client.run("bluemap start")
-            logging.info(f"Executed bluemap start -> Response: {response}")
+        response = run_command("bluemap start", target)
+        logging.info(f"Executed bluemap start -> Response: {response}")
     except Exception as e:
         logging.error(f"Failed to start BlueMap via RCON: {e}", exc_info=True)
 
-def cleanlight_at(chunk_x, chunk_z, chunk_radius, world):
+def cleanlight_at(chunk_x, chunk_z, chunk_radius, world, target=None):
     """
     Regenerates lighting for a specific chunk using the cleanlight command.
     Command syntax: /cleanlight at [chunk_x] [chunk_z] [chunk_radius] (world)
     """
     try:
-        with rcon_client() as client:
-            command = f"cleanlight at {chunk_x} {chunk_z} {chunk_radius} {world}"
-            response = client.run(command)
-            logging.info(f"Executed cleanlight command at ({chunk_x}, {chunk_z}) -> Response: {response}")
+        command = f"cleanlight at {chunk_x} {chunk_z} {chunk_radius} {world}"
+        response = run_command(command, target)
+        logging.info(f"Executed cleanlight command at ({chunk_x}, {chunk_z}) -> Response: {response}")
     except Exception as e:
         logging.error(f"Failed to execute cleanlight command for chunk ({chunk_x}, {chunk_z}): {e}", exc_info=True)
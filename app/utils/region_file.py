@@ -0,0 +1,163 @@
+"""
+app/utils/region_file.py
+
+Low-level helpers for Anvil (.mca) region files: parsing the 8 KiB header,
+splitting a file into its chunk records and writing region files with chunks
+laid out contiguously.
+
+A region file holds 32x32 chunks. The first 4 KiB is the location table (one
+big-endian u32 per chunk: sector offset << 8 | sector count), the next 4 KiB the
+timestamp table. Each chunk payload starts on a 4 KiB sector boundary as a
+u32 length, a one-byte compression type and the compressed NBT.
+"""
+
+import os
+import re
+import struct
+import numpy as np
+
+SECTOR_SIZE = 4096
+HEADER_SIZE = 2 * SECTOR_SIZE
+REGION_WIDTH = 32
+CHUNKS_PER_REGION = REGION_WIDTH * REGION_WIDTH
+# The sector count is a single byte
+MAX_CHUNK_SECTORS = 255
+
+COMPRESSION_ZLIB = 2
+
+REGION_FILE_PATTERN = re.compile(r"^r\.(-?\d+)\.(-?\d+)\.mca$")
+
+
+def region_coords(filename):
+    """Returns (rx, rz) parsed from a region file name like r.-1.2.mca, or None."""
+    match = REGION_FILE_PATTERN.match(os.path.basename(filename))
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def region_file_name(rx, rz):
+    return f"r.{rx}.{rz}.mca"
+
+
+def dimension_region_dir(dimension):
+    """
+    Path of a dimension's region folder relative to the world root, following the
+    Java layout: region/, DIM-1/region/, DIM1/region/, dimensions/<ns>/<name>/region/.
+    """
+    if dimension == "minecraft:overworld":
+        return "region"
+    if dimension == "minecraft:the_nether":
+        return os.path.join("DIM-1", "region")
+    if dimension == "minecraft:the_end":
+        return os.path.join("DIM1", "region")
+    namespace, _, name = dimension.partition(":")
+    return os.path.join("dimensions", namespace, *name.split("/"), "region")
+
+
+def region_dir_dimension(region_dir):
+    """
+    Inverse of dimension_region_dir: the dimension whose region folder is `region_dir`
+    (relative to the world root, '/' or os.sep separated), or None if it is not one.
+    """
+    parts = [part for part in region_dir.replace(os.sep, "/").split("/") if part]
+    if parts == ["region"]:
+        return "minecraft:overworld"
+    if parts == ["DIM-1", "region"]:
+        return "minecraft:the_nether"
+    if parts == ["DIM1", "region"]:
+        return "minecraft:the_end"
+    if len(parts) >= 4 and parts[0] == "dimensions" and parts[-1] == "region":
+        return f"{parts[1]}:{'/'.join(parts[2:-1])}"
+    return None
+
+
+def chunk_region(cx, cz):
+    """Region coordinates containing chunk (cx, cz)."""
+    return cx >> 5, cz >> 5
+
+
+def parse_location_table(header):
+    """
+    Parses the first 4 KiB of a region file into a (1024,) uint32 array of raw
+    location entries, indexed by local_x + local_z * 32. Short input (a truncated
+    or empty file) is treated as having no chunks past its end.
+    """
+    table = np.zeros(CHUNKS_PER_REGION, dtype=np.uint32)
+    usable = min(len(header), SECTOR_SIZE) // 4
+    if usable:
+        table[:usable] = np.frombuffer(header[:usable * 4], dtype=">u4")
+    return table
+
+
+def present_chunk_indices(location_table):
+    """Indices (local_x + local_z * 32) of chunks the location table says are stored."""
+    return np.flatnonzero(location_table)
+
+
+def read_location_table(path):
+    with open(path, "rb") as f:
+        return parse_location_table(f.read(SECTOR_SIZE))
+
+
+def live_region_bytes(location_table):
+    """Size of a region file holding exactly the sectors `location_table` says are in use."""
+    return HEADER_SIZE + int((location_table & 0xFF).sum()) * SECTOR_SIZE
+
+
+def read_region_chunks(data):
+    """
+    Splits the bytes of a region file into its chunk records. Returns
+    ({(local_x, local_z): payload}, {(local_x, local_z): timestamp}), with payloads
+    as write_region_file takes them. Raises ValueError if the header points outside
+    the file or a record's length does not fit its sectors.
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"Region file is shorter than its header ({len(data)} bytes)")
+    locations = parse_location_table(data[:SECTOR_SIZE])
+    timestamps = np.frombuffer(data[SECTOR_SIZE:HEADER_SIZE], dtype=">u4")
+    chunks, chunk_timestamps = {}, {}
+    for index in present_chunk_indices(locations):
+        offset = int(locations[index] >> 8) * SECTOR_SIZE
+        sectors = int(locations[index] & 0xFF)
+        if offset < HEADER_SIZE or offset + 4 > len(data):
+            raise ValueError(f"Chunk {index} starts outside the file (offset {offset})")
+        (length,) = struct.unpack_from(">I", data, offset)
+        if length < 1 or 4 + length > max(sectors, 1) * SECTOR_SIZE or offset + 4 + length > len(data):
+            raise ValueError(f"Chunk {index} has an invalid length ({length} bytes in {sectors} sectors)")
+        local = (int(index) % REGION_WIDTH, int(index) // REGION_WIDTH)
+        chunks[local] = data[offset + 4:offset + 4 + length]
+        chunk_timestamps[local] = int(timestamps[index])
+    return chunks, chunk_timestamps
+
+
+def write_region_file(path, chunks, timestamp=0):
+    """
+    Writes a region file with the given chunks stored back to back, each padded to
+    whole sectors. `chunks` maps (local_x, local_z) to the payload after the length
+    prefix (compression type byte + compressed data). `timestamp` is one value for
+    every chunk or a dict keyed like `chunks`.
+    Returns the number of bytes written.
+    """
+    locations = np.zeros(CHUNKS_PER_REGION, dtype=">u4")
+    timestamps = np.zeros(CHUNKS_PER_REGION, dtype=">u4")
+    body = bytearray()
+    next_sector = HEADER_SIZE // SECTOR_SIZE
+
+    for (local_x, local_z), payload in sorted(chunks.items(), key=lambda item: (item[0][1], item[0][0])):
+        record = struct.pack(">I", len(payload)) + payload
+        sectors = -(-len(record) // SECTOR_SIZE)
+        if sectors > MAX_CHUNK_SECTORS:
+            raise ValueError(f"Chunk ({local_x}, {local_z}) is too large for a region file ({len(record)} bytes)")
+        index = local_x + local_z * REGION_WIDTH
+        locations[index] = (next_sector << 8) | sectors
+        timestamps[index] = timestamp.get((local_x, local_z), 0) if isinstance(timestamp, dict) else timestamp
+        body += record
+        body += b"\x00" * (sectors * SECTOR_SIZE - len(record))
+        next_sector += sectors
+
+    with open(path, "wb") as f:
+        f.write(locations.tobytes())
+        f.write(timestamps.tobytes())
+        f.write(body)
+    return HEADER_SIZE + len(body)
@@ -0,0 +1,269 @@
+"""
+app/utils/spatial_index.py
+
+Per-dimension NumPy coordinate index over the waypoint store, used to answer
+nearest / radius / bounding-box queries without scanning Python dicts.
+"""
+
+from threading import Lock
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+
+# Minimum number of neighbours per axis examined to seed a nearest-neighbour search;
+# the window also grows with sqrt(N) so the seed radius stays tight as the index grows.
+NEAREST_SEED_WINDOW = 64
+
+# Rows added or moved since the orderings were last brought up to date are kept in a
+# small buffer that queries scan linearly; past this size it is merged into the orderings.
+PENDING_MERGE_THRESHOLD = 512
+
+# Horizontal axes with a sorted ordering; queries prune on whichever gives fewer candidates,
+# so points lined up along one axis (a road along a meridian) do not defeat the pruning
+SORTED_AXES = (0, 2)
+
+
+class _DimensionIndex:
+    """
+    Coordinates for a single dimension, stored as a growable (N, 3) float64 array.
+    Row i of `coords` belongs to `items[i]`, the same dict held in the waypoint store.
+
+    Queries prune candidates with an x-sorted and a z-sorted ordering of the rows,
+    taking the narrower slab. Adds and moves are O(1) array writes that put the row
+    in a pending buffer; queries skip its stale entries in the orderings and check
+    the buffer directly. A full buffer is merged in with one O(N) pass per axis
+    (searchsorted + insert), so the orderings are only fully re-sorted after a bulk load.
+    """
+
+    def __init__(self):
+        self.coords = np.empty((INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.count = 0
+        self.items = []
+        self.rows = {}  # lowercase warp name -> row
+        self._order = None  # axis -> rows sorted by that coordinate
+        self._sorted = None  # axis -> the coordinates in that order
+        self._stale = np.zeros(INITIAL_CAPACITY, dtype=bool)  # row's entries in _order are outdated or missing
+        self._pending = []  # rows flagged in _stale, in change order
+
+    def _grow(self, needed):
+        if needed <= len(self.coords):
+            return
+        capacity = max(needed, len(self.coords) * 2)
+        grown = np.empty((capacity, 3), dtype=np.float64)
+        grown[:self.count] = self.coords[:self.count]
+        self.coords = grown
+        stale = np.zeros(capacity, dtype=bool)
+        stale[:len(self._stale)] = self._stale
+        self._stale = stale
+
+    def _changed(self, row):
+        if self._order is None or self._stale[row]:
+            return
+        self._stale[row] = True
+        self._pending.append(row)
+        if len(self._pending) > PENDING_MERGE_THRESHOLD:
+            self._merge_pending()
+
+    def _merge_pending(self):
+        """Moves the pending rows to their current place in each ordering."""
+        pending = np.array(self._pending, dtype=np.intp)
+        for axis in SORTED_AXES:
+            keep = ~self._stale[self._order[axis]]
+            order, values = self._order[axis][keep], self._sorted[axis][keep]
+            pending_values = self.coords[pending, axis]
+            by_value = np.argsort(pending_values, kind='stable')
+            positions = np.searchsorted(values, pending_values[by_value], side='right')
+            self._order[axis] = np.insert(order, positions, pending[by_value])
+            self._sorted[axis] = np.insert(values, positions, pending_values[by_value])
+        self._stale[pending] = False
+        self._pending = []
+
+    def _ensure_order(self):
+        if self._order is None:
+            self._order, self._sorted = {}, {}
+            for axis in SORTED_AXES:
+                self._order[axis] = np.argsort(self.coords[:self.count, axis], kind='stable')
+                self._sorted[axis] = self.coords[self._order[axis], axis]
+            self._stale[:self.count] = False
+            self._pending = []
+
+    def add(self, wp):
+        self._grow(self.count + 1)
+        row = self.count
+        self.coords[row] = (wp['x'], wp['y'], wp['z'])
+        self.items.append(wp)
+        self.rows.setdefault(wp['name'].lower(), row)
+        self.count += 1
+        self._changed(row)
+
+    def extend(self, wps):
+        """Bulk add(); fills the coordinate array in one pass and re-sorts on the next query."""
+        if not wps:
+            return
+        needed = self.count + len(wps)
+        self._grow(needed)
+        flat = np.fromiter((v for wp in wps for v in (wp['x'], wp['y'], wp['z'])),
+                           dtype=np.float64, count=len(wps) * 3)
+        self.coords[self.count:needed] = flat.reshape(-1, 3)
+        for row, wp in enumerate(wps, start=self.count):
+            self.rows.setdefault(wp['name'].lower(), row)
+        self.items.extend(wps)
+        self.count = needed
+        self._order = None
+
+    def move(self, wp):
+        """Updates the coordinates of the row named like `wp`, which also replaces its stored dict."""
+        row = self.rows[wp['name'].lower()]
+        self.items[row] = wp
+        self.coords[row] = (wp['x'], wp['y'], wp['z'])
+        self._changed(row)
+
+    def narrower_axis(self, lower, upper):
+        """The sorted axis whose [lower, upper] slab holds fewer rows (pending rows aside)."""
+        self._ensure_order()
+        sizes = [
+            np.searchsorted(self._sorted[axis], upper[axis], side='right')
+            - np.searchsorted(self._sorted[axis], lower[axis], side='left')
+            for axis in SORTED_AXES
+        ]
+        return SORTED_AXES[int(np.argmin(sizes))]
+
+    def slab(self, axis, low, high):
+        """Rows whose `axis` coordinate lies in [low, high], in that coordinate's order."""
+        self._ensure_order()
+        values = self._sorted[axis]
+        lo = np.searchsorted(values, low, side='left')
+        hi = np.searchsorted(values, high, side='right')
+        rows = self._order[axis][lo:hi]
+        if not self._pending:
+            return rows
+        rows = rows[~self._stale[rows]]
+        pending = np.array(self._pending, dtype=np.intp)
+        pending_values = self.coords[pending, axis]
+        inside = (pending_values >= low) & (pending_values <= high)
+        if not inside.any():
+            return rows
+        pending, pending_values = pending[inside], pending_values[inside]
+        by_value = np.argsort(pending_values, kind='stable')
+        positions = np.searchsorted(self.coords[rows, axis], pending_values[by_value], side='right')
+        return np.insert(rows, positions, pending[by_value])
+
+    def box_rows(self, lower, upper):
+        """Rows inside the horizontal extent of the box [lower, upper], found through the narrower slab."""
+        axis = self.narrower_axis(lower, upper)
+        rows = self.slab(axis, lower[axis], upper[axis])
+        other = SORTED_AXES[1] if axis == SORTED_AXES[0] else SORTED_AXES[0]
+        values = self.coords[rows, other]
+        return rows[(values >= lower[other]) & (values <= upper[other])]
+
+    def neighbours(self, point, count):
+        """Roughly `count` rows closest to `point` along each sorted axis, plus any pending rows."""
+        self._ensure_order()
+        half = max(count // 2, 1)
+        parts = []
+        for axis in SORTED_AXES:
+            pos = np.searchsorted(self._sorted[axis], point[axis])
+            parts.append(self._order[axis][max(pos - half, 0):pos + half])
+        rows = np.unique(np.concatenate(parts))
+        if not self._pending:
+            return rows
+        return np.concatenate([rows[~self._stale[rows]], np.array(self._pending, dtype=np.intp)])
+
+    def distances_sq(self, rows, point):
+        diff = self.coords[rows] - point
+        return np.einsum('ij,ij->i', diff, diff)
+
+
+class WaypointIndex:
+    """
+    Spatial index over waypoints, keyed by dimension.
+
+    Built once from the waypoint list and kept current by calling `add` / `move`
+    whenever `receive_waypoints` mutates the store. Queries return the stored
+    waypoint dicts; a move stores a new dict, so a returned one never changes.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._dimensions = {}
+
+    def rebuild(self, waypoints, default_dimension):
+        with self._lock:
+            by_dimension = {}
+            for wp in waypoints:
+                by_dimension.setdefault(wp.get('dimension', default_dimension), []).append(wp)
+            self._dimensions = {}
+            for dim, wps in by_dimension.items():
+                self._dimensions[dim] = _DimensionIndex()
+                self._dimensions[dim].extend(wps)
+
+    def get(self, name, dimension):
+        """Returns the stored waypoint with this name (case-insensitive) in `dimension`, or None."""
+        with self._lock:
+            index = self._dimensions.get(dimension)
+            if index is None:
+                return None
+            row = index.rows.get(name.lower())
+            return index.items[row] if row is not None else None
+
+    def add(self, wp):
+        with self._lock:
+            self._dimensions.setdefault(wp['dimension'], _DimensionIndex()).add(wp)
+
+    def move(self, wp):
+        with self._lock:
+            self._dimensions[wp['dimension']].move(wp)
+
+    def nearest(self, dimension, point, k):
+        """Returns up to `k` (waypoint, distance) pairs closest to `point`, nearest first."""
+        with self._lock:
+            index = self._dimensions.get(dimension)
+            if index is None or index.count == 0:
+                return []
+            point = np.asarray(point, dtype=np.float64)
+            k = min(k, index.count)
+
+            # The k-th nearest of the x- and z-neighbours bounds the search radius; every
+            # true neighbour must then lie in the square of that half-width.
+            seed_size = max(k * 2, NEAREST_SEED_WINDOW, int(4 * np.sqrt(index.count)))
+            seed = index.neighbours(point, seed_size)
+            seed_dist_sq = index.distances_sq(seed, point)
+            if len(seed) < k:
+                bound = np.inf
+            else:
+                bound = np.sqrt(np.partition(seed_dist_sq, k - 1)[k - 1])
+
+            rows = index.box_rows(point - bound, point + bound)
+            dist_sq = index.distances_sq(rows, point)
+            if k < len(rows):
+                best = np.argpartition(dist_sq, k - 1)[:k]
+            else:
+                best = np.arange(len(rows))
+            best = best[np.argsort(dist_sq[best], kind='stable')]
+            return [(index.items[rows[i]], float(np.sqrt(dist_sq[i]))) for i in best]
+
+    def within_radius(self, dimension, point, radius, limit=None):
+        """Returns up to `limit` (waypoint, distance) pairs within `radius` of `point`, nearest first."""
+        with self._lock:
+            index = self._dimensions.get(dimension)
+            if index is None or index.count == 0:
+                return []
+            point = np.asarray(point, dtype=np.float64)
+            rows = index.box_rows(point - radius, point + radius)
+            dist_sq = index.distances_sq(rows, point)
+            hits = np.flatnonzero(dist_sq <= radius * radius)
+            hits = hits[np.argsort(dist_sq[hits], kind='stable')][:limit]
+            return [(index.items[rows[i]], float(np.sqrt(dist_sq[i]))) for i in hits]
+
+    def within_box(self, dimension, lower, upper, limit=None):
+        """Returns up to `limit` waypoints whose coordinates fall inside the inclusive box [lower, upper]."""
+        with self._lock:
+            index = self._dimensions.get(dimension)
+            if index is None or index.count == 0:
+                return []
+            lower = np.asarray(lower, dtype=np.float64)
+            upper = np.asarray(upper, dtype=np.float64)
+            rows = index.box_rows(lower, upper)
+            coords = index.coords[rows]
+            mask = np.all((coords >= lower) & (coords <= upper), axis=1)
+            return [index.items[i] for i in rows[mask][:limit]]
@@ -0,0 +1,101 @@
+"""
+app/utils/world_targets.py
+
+Named worlds that uploads can be merged into, each with its own local world
+folder (and therefore world lock), RCON endpoint, lighting world paths and
+BlueMap setup.
+
+Targets come from WORLDS_FILE, a JSON object mapping a world name to settings
+whose keys are WorldTarget attribute names, e.g.
+
+    {
+        "survival": {"local_world_dir": "/srv/survival/world", "rcon_port": 25575},
+        "creative": {
+            "local_world_dir": "/srv/creative/world",
+            "rcon_port": 25585,
+            "bluemap_config_location": "/srv/creative/BlueMap/config",
+            "bluemap_maps_path": "/srv/creative/BlueMap/config/maps"
+        }
+    }
+
+Settings a world leaves out fall back to the single-world values in app/config.py.
+Without WORLDS_FILE there is one target, DEFAULT_WORLD, built entirely from them.
+"""
+
+import json
+import os
+
+from app import config
+
+# Attribute -> single-world default from app.config
+_DEFAULTS = {
+    "local_world_dir": "LOCAL_WORLD_DIR",
+    "rcon_host": "RCON_HOST",
+    "rcon_port": "RCON_PORT",
+    "rcon_password": "RCON_PASSWORD",
+    "dimension_world_paths": "DIMENSION_TO_WORLD_PATH",
+    "bluemap_jar": "BLUEMAP_JAR",
+    "bluemap_config_location": "BLUEMAP_CONFIG_LOCATION",
+    "bluemap_working_dir": "BLUEMAP_WORKING_DIR",
+    "bluemap_maps_path": "BLUEMAP_MAPS_PATH",
+    "bluemap_mods": "BLUEMAP_MODS",
+    "dimension_bluemap_confs": "DIMENSION_TO_BLUEMAP_CONF",
+    "mc_version": "MC_VERSION",
+    "java_path": "JAVA_PATH",
+}
+
+
+def world_lock_path(world_dir):
+    """Cross-process lock file guarding writes to the world folder `world_dir`."""
+    return os.path.join(world_dir, ".world_lock.lock")
+
+
+class WorldTarget:
+    def __init__(self, name, **settings):
+        unknown = set(settings) - set(_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown settings for world '{name}': {', '.join(sorted(unknown))}")
+        self.name = name
+        for attribute, config_name in _DEFAULTS.items():
+            setattr(self, attribute, settings.get(attribute, getattr(config, config_name)))
+        self.rcon_port = int(self.rcon_port)
+
+    @property
+    def lock_path(self):
+        return world_lock_path(self.local_world_dir)
+
+    def describe(self):
+        """Public summary (no credentials) for the API."""
+        return {
+            "name": self.name,
+            "local_world_dir": self.local_world_dir,
+            "rcon": f"{self.rcon_host}:{self.rcon_port}",
+            "bluemap_maps": sorted(self.dimension_bluemap_confs.values()),
+        }
+
+
+def load_world_targets(path=None):
+    """Reads the world targets; returns ({name: WorldTarget}, default world name)."""
+    path = config.WORLDS_FILE if path is None else path
+    if not os.path.isfile(path):
+        return {config.DEFAULT_WORLD: WorldTarget(config.DEFAULT_WORLD)}, config.DEFAULT_WORLD
+
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not data:
+        raise ValueError(f"{path} must be a JSON object mapping world names to settings")
+    targets = {name: WorldTarget(name, **(settings or {})) for name, settings in data.items()}
+
+    lock_paths = [os.path.abspath(target.lock_path) for target in targets.values()]
+    if len(set(lock_paths)) != len(lock_paths):
+        raise ValueError(f"{path}: every world needs its own local_world_dir")
+    default = config.DEFAULT_WORLD if config.DEFAULT_WORLD in targets else next(iter(targets))
+    return targets, default
+
+
+WORLD_TARGETS, DEFAULT_WORLD_NAME = load_world_targets()
+
+
+def get_world_target(name=None):
+    """The named target (the default one for None), or None if there is no such world."""
+    return WORLD_TARGETS.get(name or DEFAULT_WORLD_NAME)
@@ -0,0 +1,53 @@
+"""
+benchmarks/fake_bluemap.py
+
+Stand-in for the BlueMap CLI jar used by run_bluemap_render. Invoked with the same
+arguments as `java -jar bluemap.jar ... --maps a,b --render`, it prints BlueMap-style
+"Update map 'a': 12.345% (ETA: 0:01:02)" lines for each map over
+FAKE_BLUEMAP_SECONDS (default 5), then "Your maps are now all up-to-date!", and then
+idles like --watch mode until it is terminated.
+
+The load harness points JAVA_PATH at a small wrapper script that runs this file.
+"""
+
+import os
+import sys
+import time
+
+
+def _arg_value(argv, flag, default=None):
+    if flag in argv and argv.index(flag) + 1 < len(argv):
+        return argv[argv.index(flag) + 1]
+    return default
+
+
+def _format_eta(seconds):
+    seconds = max(int(seconds), 0)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def main(argv):
+    maps = _arg_value(argv, "--maps", "world").split(",")
+    duration = float(os.getenv("FAKE_BLUEMAP_SECONDS", "5"))
+    updates_per_map = int(os.getenv("FAKE_BLUEMAP_UPDATES", "20"))
+    per_map = duration / max(len(maps), 1)
+
+    print("[INFO] Loading resources...", flush=True)
+    print(f"[INFO] Start updating {len(maps)} maps ({len(maps) * 1024} regions, ~{len(maps) * 1048576} chunks)...",
+          flush=True)
+    for map_id in maps:
+        for step in range(1, updates_per_map + 1):
+            time.sleep(per_map / updates_per_map)
+            percent = 100.0 * step / updates_per_map
+            remaining = per_map * (updates_per_map - step) / updates_per_map
+            print(f"[INFO] Update map '{map_id}': {percent:.3f}% (ETA: {_format_eta(remaining)})", flush=True)
+        print(f"[INFO] Map '{map_id}' updated.", flush=True)
+    print("[INFO] Your maps are now all up-to-date!", flush=True)
+
+    # --watch keeps BlueMap running; the worker terminates us
+    while True:
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,126 @@
+"""
+benchmarks/fake_rcon.py
+
+A stand-in Source RCON server for load testing, so rcon_helper can be exercised
+without a Minecraft server. Accepts any command, replies with a canned response
+after a configurable per-command latency, and counts what it received.
+
+    python -m benchmarks.fake_rcon --port 25575 --password secret \\
+        --latency cleanlight=0.05 --latency "bluemap stop=0.5"
+"""
+
+import argparse
+import socketserver
+import struct
+import threading
+import time
+
+SERVERDATA_RESPONSE_VALUE = 0
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_AUTH = 3
+
+
+def _read_packet(stream):
+    """Returns (request_id, type, body) or None when the client hung up."""
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    (size,) = struct.unpack("<i", header)
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    request_id, packet_type = struct.unpack("<ii", data[:8])
+    return request_id, packet_type, data[8:-2].decode("utf-8", errors="replace")
+
+
+def _packet(request_id, packet_type, body):
+    payload = struct.pack("<ii", request_id, packet_type) + body.encode("utf-8") + b"\x00\x00"
+    return struct.pack("<i", len(payload)) + payload
+
+
+class FakeRconServer(socketserver.ThreadingTCPServer):
+    """
+    `latencies` maps a command prefix (e.g. "cleanlight" or "bluemap stop") to the
+    seconds to wait before answering; the longest matching prefix wins, otherwise
+    `default_latency` applies.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, password, latencies=None, default_latency=0.0):
+        super().__init__(address, _RconHandler)
+        self.password = password
+        self.latencies = dict(latencies or {})
+        self.default_latency = default_latency
+        self.command_counts = {}
+        self._counts_lock = threading.Lock()
+
+    def latency_for(self, command):
+        matches = [prefix for prefix in self.latencies if command.startswith(prefix)]
+        return self.latencies[max(matches, key=len)] if matches else self.default_latency
+
+    def record(self, command):
+        label = " ".join(command.split()[:2])
+        with self._counts_lock:
+            self.command_counts[label] = self.command_counts.get(label, 0) + 1
+
+    def start(self):
+        """Serves in a daemon thread; returns the bound (host, port)."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
+
+
+class _RconHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        authenticated = False
+        while True:
+            packet = _read_packet(self.rfile)
+            if packet is None:
+                return
+            request_id, packet_type, body = packet
+
+            if packet_type == SERVERDATA_AUTH:
+                authenticated = body == self.server.password
+                self.wfile.write(_packet(request_id if authenticated else -1, SERVERDATA_AUTH_RESPONSE, ""))
+            elif packet_type == SERVERDATA_EXECCOMMAND and authenticated:
+                self.server.record(body)
+                time.sleep(self.server.latency_for(body))
+                self.wfile.write(_packet(request_id, SERVERDATA_RESPONSE_VALUE, f"OK: {body}"))
+            else:
+                self.wfile.write(_packet(request_id, SERVERDATA_RESPONSE_VALUE, ""))
+            self.wfile.flush()
+
+
+def parse_latencies(values):
+    """Parses repeated 'prefix=seconds' options."""
+    latencies = {}
+    for value in values or []:
+        prefix, _, seconds = value.rpartition("=")
+        latencies[prefix] = float(seconds)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Source RCON server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=25575)
+    parser.add_argument("--password", default="default_password")
+    parser.add_argument("--latency", action="append", metavar="PREFIX=SECONDS",
+                        help="Per-command latency, e.g. cleanlight=0.05 (repeatable)")
+    parser.add_argument("--default-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeRconServer((args.host, args.port), args.password,
+                            parse_latencies(args.latency), args.default_latency)
+    print(f"Fake RCON listening on {args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Commands received: {server.command_counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+benchmarks/load_harness.py
+
+End-to-end load test of the service under gunicorn, fully self-contained:
+
+  * a synthetic local world (LOCAL_WORLD_DIR) and upload archive are generated
+  * a fake Source RCON server stands in for the Minecraft server, with
+    configurable per-command latency
+  * JAVA_PATH points at a wrapper that runs benchmarks/fake_bluemap.py, which
+    prints realistic "Update map ... %" progress lines
+  * gunicorn is started with gunicorn.conf.py against that environment
+
+Then concurrent clients drive POST /merge uploads, GET /merge/status polls and
+POST /api/waypoints pushes for --duration seconds. The harness waits for queued
+merges to drain and prints request latency percentiles per endpoint and
+end-to-end job times as JSON.
+
+    python -m benchmarks.load_harness --duration 60 --uploaders 1 --pollers 8 \\
+        --pushers 4 --latency cleanlight=0.02
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from benchmarks.fake_rcon import FakeRconServer, parse_latencies
+from benchmarks.merge_bench import _zip_world
+from benchmarks.synthetic_world import generate_world
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY = "load-harness-key"
+RCON_PASSWORD = "load-harness"
+BLUEMAP_CONFS = {
+    "BLUEMAP_CONF_OVERWORLD": "world.conf",
+    "BLUEMAP_CONF_NETHER": "dim-1.conf",
+    "BLUEMAP_CONF_END": "dim1.conf",
+    "BLUEMAP_CONF_ULTRA_SPACE": "ultra_space.conf",
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(rank(0.50) * 1000, 2),
+        "p90_ms": round(rank(0.90) * 1000, 2),
+        "p99_ms": round(rank(0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and error collection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def request(self, name, req, timeout=60):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as response:
+                body = response.read()
+            ok = True
+        except (urllib.error.URLError, OSError) as e:
+            body, ok = None, False
+            with self._lock:
+                self.errors.setdefault(name, {})
+                key = getattr(e, "code", None) or type(e).__name__
+                self.errors[name][str(key)] = self.errors[name].get(str(key), 0) + 1
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.setdefault(name, []).append(elapsed)
+        return json.loads(body) if ok and body else None
+
+
+def _multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/zip\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def prepare_environment(workdir, chunks, rcon_port, bind, bluemap_seconds):
+    """Generates the worlds and BlueMap stand-ins; returns (env for gunicorn, upload archive bytes)."""
+    local_world = os.path.join(workdir, "local_world")
+    generate_world(local_world, chunks, ["minecraft:overworld", "minecraft:the_nether"], seed=1)
+    upload_world = os.path.join(workdir, "upload_world")
+    generate_world(upload_world, chunks, ["minecraft:overworld", "minecraft:the_nether"],
+                   empty_fraction=0.2, seed=2, offset=(4, 4))
+    archive = os.path.join(workdir, "upload.zip")
+    _zip_world(upload_world, archive)
+    with open(archive, "rb") as f:
+        archive_bytes = f.read()
+
+    maps_dir = os.path.join(workdir, "bluemap", "maps")
+    os.makedirs(maps_dir, exist_ok=True)
+    for conf in BLUEMAP_CONFS.values():
+        with open(os.path.join(maps_dir, conf), "w") as f:
+            f.write("marker-sets: {\n}\n")
+
+    java_wrapper = os.path.join(workdir, "fake-java")
+    with open(java_wrapper, "w") as f:
+        f.write(f"#!/bin/sh\nexec \"{sys.executable}\" \"{os.path.join(REPO_ROOT, 'benchmarks', 'fake_bluemap.py')}\" \"$@\"\n")
+    os.chmod(java_wrapper, 0o755)
+
+    env = dict(os.environ)
+    env.update({
+        "BIND": bind,
+        "API_KEY": API_KEY,
+        "RCON_HOST": "127.0.0.1",
+        "RCON_PORT": str(rcon_port),
+        "RCON_PASSWORD": RCON_PASSWORD,
+        "JAVA_PATH": java_wrapper,
+        "BLUEMAP_JAR": os.path.join(workdir, "bluemap", "bluemap-cli.jar"),
+        "BLUEMAP_WORKING_DIR": os.path.join(workdir, "bluemap"),
+        "BLUEMAP_MAPS_PATH": maps_dir,
+        "BLUEMAP_CONFIG_LOCATION": os.path.join(workdir, "bluemap"),
+        "FAKE_BLUEMAP_SECONDS": str(bluemap_seconds),
+        "LOCAL_WORLD_DIR": local_world,
+        "DATA_FILE": os.path.join(workdir, "waypoints.json"),
+        "JOBS_DIR": os.path.join(workdir, "jobs"),
+        "LOG_DIR": os.path.join(workdir, "logs"),
+        "LOG_LEVEL": "WARNING",
+    })
+    env.update(BLUEMAP_CONFS)
+    return env, archive_bytes
+
+
+def wait_until_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/waypoints", timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Service at {base_url} did not become ready within {timeout}s")
+
+
+def drive_load(base_url, archive_bytes, args, recorder):
+    """Runs the client threads for args.duration seconds; returns the job ids queued."""
+    stop = threading.Event()
+    job_ids = []
+
+    def uploader():
+        while not stop.is_set():
+            body, content_type = _multipart("world_zip", "upload.zip", archive_bytes)
+            req = urllib.request.Request(f"{base_url}/merge", data=body, method="POST",
+                                         headers={"Content-Type": content_type})
+            result = recorder.request("POST /merge", req)
+            if result and result.get("job_id"):
+                job_ids.append(result["job_id"])
+            stop.wait(args.merge_interval)
+
+    def poller():
+        while not stop.is_set():
+            recorder.request("GET /merge/status", urllib.request.Request(f"{base_url}/merge/status"))
+            stop.wait(args.poll_interval)
+
+    def pusher(index):
+        rng = random.Random(index)
+        while not stop.is_set():
+            warps = [{
+                "name": f"load-{index}-{rng.randrange(args.warp_names)}",
+                "x": rng.uniform(-5000, 5000),
+                "y": rng.uniform(0, 256),
+                "z": rng.uniform(-5000, 5000),
+                "dimension": "minecraft:overworld",
+            } for _ in range(args.warps_per_push)]
+            req = urllib.request.Request(f"{base_url}/api/waypoints", data=json.dumps(warps).encode(),
+                                         method="POST", headers={"Content-Type": "application/json",
+                                                                 "x-api-key": API_KEY})
+            recorder.request("POST /api/waypoints", req)
+            stop.wait(args.push_interval)
+
+    threads = [threading.Thread(target=uploader) for _ in range(args.uploaders)]
+    threads += [threading.Thread(target=poller) for _ in range(args.pollers)]
+    threads += [threading.Thread(target=pusher, args=(i,)) for i in range(args.pushers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return job_ids
+
+
+def wait_for_jobs(base_url, job_ids, timeout):
+    """Polls job records until every queued job finished or `timeout` passes; returns the records found."""
+    deadline = time.monotonic() + timeout
+    records = {}
+    while time.monotonic() < deadline and len(records) < len(job_ids):
+        for job_id in job_ids:
+            if job_id in records:
+                continue
+            try:
+                with urllib.request.urlopen(f"{base_url}/merge/jobs/{job_id}", timeout=5) as response:
+                    records[job_id] = json.loads(response.read())
+            except (urllib.error.URLError, OSError):
+                pass
+        time.sleep(1)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test WorldSync under gunicorn with fake RCON and BlueMap.")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of client load")
+    parser.add_argument("--chunks", type=int, default=256, help="Chunks per dimension in the generated worlds")
+    parser.add_argument("--uploaders", type=int, default=1)
+    parser.add_argument("--merge-interval", type=float, default=10)
+    parser.add_argument("--pollers", type=int, default=4)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--pushers", type=int, default=2)
+    parser.add_argument("--push-interval", type=float, default=0.5)
+    parser.add_argument("--warps-per-push", type=int, default=50)
+    parser.add_argument("--warp-names", type=int, default=500, help="Distinct warp names per pusher")
+    parser.add_argument("--latency", action="append", metavar="PREFIX=SECONDS",
+                        help="Fake RCON per-command latency, e.g. cleanlight=0.02 (repeatable)")
+    parser.add_argument("--default-latency", type=float, default=0.005)
+    parser.add_argument("--bluemap-seconds", type=float, default=5, help="Duration of each fake render")
+    parser.add_argument("--drain-timeout", type=float, default=600,
+                        help="Seconds to wait for queued merges to finish after the load phase")
+    parser.add_argument("--workdir", help="Working directory (default: a temp dir, removed after)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="worldsync_load_")
+    rcon = FakeRconServer(("127.0.0.1", 0), RCON_PASSWORD, parse_latencies(args.latency), args.default_latency)
+    _, rcon_port = rcon.start()
+    bind = f"127.0.0.1:{_free_port()}"
+    base_url = f"http://{bind}"
+    env, archive_bytes = prepare_environment(workdir, args.chunks, rcon_port, bind, args.bluemap_seconds)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    recorder = Recorder()
+    try:
+        boot_start = time.perf_counter()
+        wait_until_ready(base_url, timeout=120)
+        boot_seconds = time.perf_counter() - boot_start
+
+        job_ids = drive_load(base_url, archive_bytes, args, recorder)
+        records = wait_for_jobs(base_url, job_ids, args.drain_timeout)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+        rcon.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    job_times = [r["finished_at"] - r["queued_at"] for r in records.values()]
+    report = {
+        "duration_seconds": args.duration,
+        "boot_seconds": round(boot_seconds, 2),
+        "endpoints": {name: percentiles(samples) for name, samples in sorted(recorder.latencies.items())},
+        "errors": recorder.errors,
+        "jobs": {
+            "queued": len(job_ids),
+            "finished": len(records),
+            "failed": sum(1 for r in records.values() if r.get("result") != "success"),
+            "end_to_end": {k.replace("_ms", "_s"): (round(v / 1000, 3) if k.endswith("_ms") else v)
+                           for k, v in percentiles(job_times).items()},
+            "stage_seconds": [r.get("stage_seconds") for r in records.values()],
+        },
+        "rcon_commands": rcon.command_counts,
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+benchmarks/merge_bench.py
+
+Offline throughput benchmark for the merge engine. Generates a synthetic upload
+world and an overlapping local world, then times the same stages process_zip runs:
+
+    extract     extract_archive on the uploaded archive (--format zip, tar or tar.zst)
+    world_load  amulet.load_level on both worlds
+    count       count_mergeable_chunks on the upload (get_chunk + is_chunk_empty)
+    merge       merge_amulet_worlds into the local world
+    save        local_world.save()
+
+plus an is_chunk_empty micro-benchmark over already-loaded chunks. For each stage it
+reports seconds, chunks/sec and peak RSS so far; for the run, disk bytes written.
+world_load opens the worlds without reading chunks, so its cost does not scale with
+the chunk count: it reports seconds only and is left out of the regression check.
+--empty-fraction leaves that share of the upload's chunk slots ungenerated; the
+run fails if the count stage does not find exactly the chunks that were written.
+
+Results are JSON. --save writes them as a baseline; --compare checks a run against a
+baseline and exits non-zero if any per-chunk stage's chunks/sec dropped by more
+than --tolerance.
+
+    python -m benchmarks.merge_bench --chunks 2048 --empty-fraction 0.25 \\
+        --compare benchmarks/baselines/default.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from contextlib import ExitStack
+from importlib import metadata
+
+from app.utils.archive_extract import ARCHIVE_FORMATS, TAR_ZST, ZIP, extract_archive
+from benchmarks.synthetic_world import DEFAULT_DIMENSIONS, generate_world
+
+STAGES = ("extract", "world_load", "count", "merge", "save")
+# Stages whose cost does not depend on the chunk count; timed, but not rated per chunk
+FIXED_COST_STAGES = ("world_load",)
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _io_write_bytes():
+    """Bytes this process caused to be written to storage, where the OS reports it."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _zip_world(world_dir, zip_path):
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for root, _, files in os.walk(world_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                zf.write(path, os.path.relpath(path, world_dir))
+
+
+def _archive_world(world_dir, archive_path, archive_format):
+    """Packs `world_dir` into a zip, tar or tar.zst archive, the way a client would upload it."""
+    if archive_format == ZIP:
+        _zip_world(world_dir, archive_path)
+        return
+    with ExitStack() as stack:
+        f = stack.enter_context(open(archive_path, "wb"))
+        if archive_format == TAR_ZST:
+            import zstandard
+            f = stack.enter_context(zstandard.ZstdCompressor().stream_writer(f))
+        tf = stack.enter_context(tarfile.open(fileobj=f, mode="w|"))
+        for root, _, files in os.walk(world_dir):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                tf.add(path, os.path.relpath(path, world_dir))
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def run_benchmark(chunks, dimensions, empty_fraction, sections, overlap, seed, workdir, archive_format=ZIP):
+    import amulet
+    from app.utils.amulet_merge import (
+        count_mergeable_chunks,
+        is_chunk_empty,
+        merge_amulet_worlds,
+        remap_dimension,
+    )
+
+    upload_dir = os.path.join(workdir, "upload")
+    local_dir = os.path.join(workdir, "local")
+    archive_path = os.path.join(workdir, f"upload.{archive_format}")
+    extracted_dir = os.path.join(workdir, "extracted")
+
+    # The local world covers the same dimensions under their local names, shifted so
+    # that `overlap` of the uploaded chunks overwrite existing ones and the rest are new.
+    upload_summary = generate_world(upload_dir, chunks, dimensions, empty_fraction, sections, seed)
+    side = max(1, int(chunks ** 0.5 + 0.999999))
+    shift = int(round(side * (1 - overlap)))
+    generate_world(local_dir, chunks, [remap_dimension(d) for d in dimensions], 0.0, sections,
+                   seed + 1, offset=(shift, 0))
+    _archive_world(upload_dir, archive_path, archive_format)
+    local_size_before = _tree_size(local_dir)
+    empty_chunks = sum(info["empty_chunks"] for info in upload_summary.values())
+    total_chunks = chunks * len(dimensions) - empty_chunks
+
+    stages = {}
+
+    def record(stage, seconds, chunk_count=None):
+        stages[stage] = {"seconds": round(seconds, 4)}
+        if chunk_count is not None:
+            stages[stage]["chunks_per_sec"] = round(chunk_count / seconds, 1) if seconds > 0 else None
+        stages[stage]["peak_rss_bytes"] = _peak_rss_bytes()
+
+    io_before = _io_write_bytes()
+
+    start = time.perf_counter()
+    extraction = extract_archive(archive_path, extracted_dir)
+    record("extract", time.perf_counter() - start, total_chunks)
+    stages["extract"]["workers"] = extraction["workers"]
+    stages["extract"]["mb_per_sec"] = extraction["mb_per_sec"]
+
+    start = time.perf_counter()
+    uploaded_world = amulet.load_level(extracted_dir)
+    local_world = amulet.load_level(local_dir)
+    record("world_load", time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        mergeable = count_mergeable_chunks(uploaded_world)
+        record("count", time.perf_counter() - start, total_chunks)
+        if mergeable != total_chunks:
+            raise RuntimeError(f"count_mergeable_chunks found {mergeable} chunks, but the upload has "
+                               f"{total_chunks} ({empty_chunks} of {chunks * len(dimensions)} slots left empty)")
+
+        # is_chunk_empty alone, on chunks the count pass already loaded into the cache
+        loaded = [uploaded_world.get_chunk(cx, cz, dimension)
+                  for dimension in uploaded_world.dimensions
+                  for cx, cz in list(uploaded_world.all_chunk_coords(dimension))[:256]]
+        repeats = max(1, 100000 // max(len(loaded), 1))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for chunk in loaded:
+                is_chunk_empty(chunk)
+        empty_check_seconds = time.perf_counter() - start
+        empty_checks = repeats * len(loaded)
+
+        start = time.perf_counter()
+        merged = merge_amulet_worlds(uploaded_world, local_world)
+        record("merge", time.perf_counter() - start, len(merged))
+
+        start = time.perf_counter()
+        local_world.save()
+        record("save", time.perf_counter() - start, len(merged))
+    finally:
+        local_world.close()
+        uploaded_world.close()
+
+    io_after = _io_write_bytes()
+    return {
+        "benchmark": "merge",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {
+            "chunks_per_dimension": chunks,
+            "dimensions": list(dimensions),
+            "empty_fraction": empty_fraction,
+            "sections_per_chunk": sections,
+            "overlap": overlap,
+            "seed": seed,
+            "archive_format": archive_format,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "amulet_core": _package_version("amulet-core"),
+            "cpu_count": os.cpu_count(),
+        },
+        "chunks": {
+            "uploaded": total_chunks,
+            "empty": empty_chunks,
+            "mergeable": mergeable,
+            "merged": len(merged),
+        },
+        "archive_bytes": os.path.getsize(archive_path),
+        "stages": stages,
+        "is_chunk_empty": {
+            "calls": empty_checks,
+            "calls_per_sec": round(empty_checks / empty_check_seconds, 1) if empty_check_seconds > 0 else None,
+        },
+        "disk_bytes_written": (io_after - io_before) if io_before is not None and io_after is not None else None,
+        "local_world_growth_bytes": _tree_size(local_dir) - local_size_before,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Returns human-readable regression lines for stages slower than the baseline by more than `tolerance`."""
+    regressions = []
+    if result["params"] != baseline.get("params"):
+        print("warning: benchmark parameters differ from the baseline; comparison is approximate")
+    for stage in STAGES:
+        if stage in FIXED_COST_STAGES:
+            current = result["stages"].get(stage, {}).get("seconds")
+            previous = baseline.get("stages", {}).get(stage, {}).get("seconds")
+            if current is not None and previous is not None:
+                print(f"{stage:>10}: {current:>10.4f} s       vs {previous:>10.4f} (not checked)")
+            continue
+        current = result["stages"].get(stage, {}).get("chunks_per_sec")
+        previous = baseline.get("stages", {}).get(stage, {}).get("chunks_per_sec")
+        if not current or not previous:
+            continue
+        change = current / previous - 1
+        print(f"{stage:>10}: {current:>10.1f} chunks/s vs {previous:>10.1f} ({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(f"{stage} throughput dropped {-change:.1%} ({previous} -> {current} chunks/s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Amulet merge pipeline on synthetic worlds.")
+    parser.add_argument("--chunks", type=int, default=1024, help="Chunks per dimension in the upload")
+    parser.add_argument("--dimensions", default=",".join(DEFAULT_DIMENSIONS))
+    parser.add_argument("--empty-fraction", type=float, default=0.25)
+    parser.add_argument("--sections", type=int, default=4, help="Filled sections per non-empty chunk")
+    parser.add_argument("--overlap", type=float, default=0.5,
+                        help="Fraction of uploaded chunks that overwrite existing local chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=ARCHIVE_FORMATS, default=ZIP, help="Archive format of the upload")
+    parser.add_argument("--workdir", help="Directory for generated worlds (default: a temp dir, removed after)")
+    parser.add_argument("--save", help="Write the result as a baseline JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed fractional drop in chunks/sec before a stage counts as a regression")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="worldsync_bench_")
+    try:
+        result = run_benchmark(args.chunks, args.dimensions.split(","), args.empty_fraction,
+                               args.sections, args.overlap, args.seed, workdir, args.format)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(result, indent=4)
+    print(output)
+    if args.save:
+        with open(args.save, "w") as f:
+            f.write(output + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+benchmarks/synthetic_world.py
+
+Generates synthetic Java Edition worlds (level.dat + Anvil region files) for
+benchmarking the merge pipeline offline, without a Minecraft server.
+
+Chunks are laid out in a square around the origin in every requested dimension.
+Non-empty chunks get `sections_per_chunk` sections of paletted blocks from the
+bottom of the world up. Empty chunks are slots of the square left out of the
+region file, like terrain the server never generated: a chunk saved with no
+sections still loads with (all-air) block storage, so is_chunk_empty would not
+treat it as empty and the merge would copy it.
+
+    python -m benchmarks.synthetic_world /tmp/world --chunks 4096 \\
+        --dimensions minecraft:overworld,minecraft:ultra_space --empty-fraction 0.2
+"""
+
+import argparse
+import math
+import os
+import time
+import zlib
+import numpy as np
+from amulet_nbt import (
+    ByteTag,
+    CompoundTag,
+    IntTag,
+    ListTag,
+    LongArrayTag,
+    LongTag,
+    NamedTag,
+    StringTag,
+)
+from app.utils.region_file import (
+    COMPRESSION_ZLIB,
+    REGION_WIDTH,
+    chunk_region,
+    dimension_region_dir,
+    region_file_name,
+    write_region_file,
+)
+
+# Java 1.20.2, matching the default MC_VERSION
+DATA_VERSION = 3578
+VERSION_NAME = "1.20.2"
+# Lowest section per dimension type; the nether and end keep the pre-1.18 0..256 range
+OVERWORLD_MIN_SECTION_Y = -4
+LEGACY_MIN_SECTION_Y = 0
+
+DEFAULT_DIMENSIONS = ("minecraft:overworld", "minecraft:the_nether", "minecraft:the_end", "minecraft:ultra_space")
+
+BLOCK_PALETTE = (
+    "minecraft:air",
+    "minecraft:stone",
+    "minecraft:deepslate",
+    "minecraft:dirt",
+    "minecraft:gravel",
+    "minecraft:iron_ore",
+    "minecraft:water",
+    "minecraft:granite",
+)
+
+
+def _pack_block_states(indices, bits):
+    """Packs 4096 palette indices into longs the 1.16+ way (entries never span two longs)."""
+    per_long = 64 // bits
+    padded = np.zeros(-(-len(indices) // per_long) * per_long, dtype=np.uint64)
+    padded[:len(indices)] = indices
+    shifts = (np.arange(per_long, dtype=np.uint64) * np.uint64(bits))
+    packed = np.bitwise_or.reduce(padded.reshape(-1, per_long) << shifts, axis=1)
+    return packed.view(np.int64)
+
+
+def _section(y, rng):
+    bits = max(4, math.ceil(math.log2(len(BLOCK_PALETTE))))
+    indices = rng.integers(0, len(BLOCK_PALETTE), size=4096, dtype=np.uint64)
+    return CompoundTag({
+        "Y": ByteTag(y),
+        "block_states": CompoundTag({
+            "palette": ListTag([CompoundTag({"Name": StringTag(name)}) for name in BLOCK_PALETTE]),
+            "data": LongArrayTag(_pack_block_states(indices, bits)),
+        }),
+        "biomes": CompoundTag({
+            "palette": ListTag([StringTag("minecraft:plains")]),
+        }),
+    })
+
+
+def min_section_y(dimension):
+    if dimension in ("minecraft:the_nether", "minecraft:the_end"):
+        return LEGACY_MIN_SECTION_Y
+    return OVERWORLD_MIN_SECTION_Y
+
+
+def chunk_nbt(cx, cz, sections, min_y, rng):
+    """Serialised (uncompressed) NBT for one chunk with `sections` filled sections from section `min_y` up."""
+    root = CompoundTag({
+        "DataVersion": IntTag(DATA_VERSION),
+        "xPos": IntTag(cx),
+        "zPos": IntTag(cz),
+        "yPos": IntTag(min_y),
+        "Status": StringTag("minecraft:full"),
+        "LastUpdate": LongTag(0),
+        "InhabitedTime": LongTag(0),
+        "isLightOn": ByteTag(0),
+        "sections": ListTag([_section(min_y + i, rng) for i in range(sections)], 10),
+        "block_entities": ListTag([], 10),
+        "Heightmaps": CompoundTag(),
+    })
+    return NamedTag(root).save_to(compressed=False)
+
+
+def _dimension_type(dimension):
+    """WorldGenSettings type entry; custom dimensions get an inline overworld-height type."""
+    if dimension in ("minecraft:overworld", "minecraft:the_nether", "minecraft:the_end"):
+        return StringTag(dimension)
+    return CompoundTag({
+        "min_y": IntTag(OVERWORLD_MIN_SECTION_Y * 16),
+        "height": IntTag(384),
+    })
+
+
+def write_level_dat(world_dir, level_name, dimensions):
+    data = CompoundTag({
+        "DataVersion": IntTag(DATA_VERSION),
+        "Version": CompoundTag({
+            "Id": IntTag(DATA_VERSION),
+            "Name": StringTag(VERSION_NAME),
+            "Snapshot": ByteTag(0),
+        }),
+        "LevelName": StringTag(level_name),
+        "LastPlayed": LongTag(int(time.time() * 1000)),
+        "version": IntTag(19133),
+        "SpawnX": IntTag(0),
+        "SpawnY": IntTag(64),
+        "SpawnZ": IntTag(0),
+        "WorldGenSettings": CompoundTag({
+            "dimensions": CompoundTag({
+                dimension: CompoundTag({"type": _dimension_type(dimension)}) for dimension in dimensions
+            }),
+        }),
+    })
+    NamedTag(CompoundTag({"Data": data})).save_to(os.path.join(world_dir, "level.dat"), compressed=True)
+
+
+def chunk_layout(count, offset=(0, 0)):
+    """`count` chunk coordinates filling a square centred on the origin, shifted by `offset`."""
+    side = max(1, math.ceil(math.sqrt(count)))
+    start = -(side // 2)
+    return [(start + i % side + offset[0], start + i // side + offset[1]) for i in range(count)]
+
+
+def generate_world(world_dir, chunks_per_dimension, dimensions=DEFAULT_DIMENSIONS,
+                   empty_fraction=0.0, sections_per_chunk=4, seed=0, offset=(0, 0)):
+    """
+    Writes a synthetic world to `world_dir` and returns a summary dict with the
+    number of chunk slots, empty (unwritten) chunks, region files and bytes
+    written per dimension.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(world_dir, exist_ok=True)
+    write_level_dat(world_dir, os.path.basename(os.path.normpath(world_dir)), dimensions)
+
+    summary = {}
+    for dimension in dimensions:
+        region_dir = os.path.join(world_dir, dimension_region_dir(dimension))
+        os.makedirs(region_dir, exist_ok=True)
+
+        regions = {}
+        empty = 0
+        min_y = min_section_y(dimension)
+        for cx, cz in chunk_layout(chunks_per_dimension, offset):
+            if rng.random() < empty_fraction:
+                empty += 1
+                continue
+            nbt = chunk_nbt(cx, cz, sections_per_chunk, min_y, rng)
+            payload = bytes([COMPRESSION_ZLIB]) + zlib.compress(nbt)
+            local = (cx % REGION_WIDTH, cz % REGION_WIDTH)
+            regions.setdefault(chunk_region(cx, cz), {})[local] = payload
+
+        written = 0
+        for (rx, rz), chunks in regions.items():
+            written += write_region_file(os.path.join(region_dir, region_file_name(rx, rz)), chunks,
+                                         timestamp=int(time.time()))
+        summary[dimension] = {
+            "chunks": chunks_per_dimension,
+            "empty_chunks": empty,
+            "regions": len(regions),
+            "bytes": written,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Java world for benchmarks.")
+    parser.add_argument("world_dir")
+    parser.add_argument("--chunks", type=int, default=1024, help="Chunks per dimension")
+    parser.add_argument("--dimensions", default=",".join(DEFAULT_DIMENSIONS))
+    parser.add_argument("--empty-fraction", type=float, default=0.0,
+                        help="Fraction of chunk slots left ungenerated")
+    parser.add_argument("--sections", type=int, default=4, help="Filled sections per non-empty chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate_world(args.world_dir, args.chunks, args.dimensions.split(","),
+                             args.empty_fraction, args.sections, args.seed)
+    for dimension, info in summary.items():
+        print(f"{dimension}: {info['chunks']} chunks ({info['empty_chunks']} empty), "
+              f"{info['regions']} regions, {info['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
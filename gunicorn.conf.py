@@ -3,11 +3,15 @@ import os
 import logging
 import sys
 from app.utils.compressed_rotating_handler import CompressedRotatingFileHandler
+from app.utils.log_pipeline import start_queue_logging, stop_queue_logging
 from gunicorn.glogging import Logger
 
 # Server config
 bind = os.getenv('BIND', '0.0.0.0:5001')
 workers = 1
+# Threads per worker; progress streams and long-polls hold one thread each while open,
+# at most PROGRESS_MAX_WATCHERS of them (app/config.py; default half of THREADS)
+threads = int(os.getenv('THREADS', '16'))
 loglevel = os.getenv('LOG_LEVEL', 'info').lower()
 accesslog = '-'  # Disable default access log
 errorlog = '-'  # Disable default error log
@@ -16,12 +20,17 @@ errorlog = '-'  # Disable default error log
 LOG_DIR = os.getenv("LOG_DIR", "logs")
 MAX_BYTES = 10 * 1024 * 1024  # 10 MB
 BACKUP_COUNT = 5  # Number of compressed archives to keep
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # Records buffered for the writer thread
 
 
 class UnifiedLogger(Logger):
 	def setup(self, cfg):
 		super().setup(cfg)
 
+		# Handlers below write from a listener thread; loggers only enqueue records
+		for queue_handler in getattr(self, 'queue_handlers', []):
+			stop_queue_logging(queue_handler)
+
 		# Formatters
 		std_formatter = logging.Formatter(
 			'[%(asctime)s] [%(process)d] [%(levelname)s] %(message)s'
@@ -43,7 +52,8 @@ class UnifiedLogger(Logger):
 		# Configure root logger
 		root_logger = logging.getLogger()
 		root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
-		root_logger.handlers = [app_handler, console_handler]
+		app_queue_handler = start_queue_logging([app_handler, console_handler], LOG_QUEUE_SIZE)
+		root_logger.handlers = [app_queue_handler]
 
 		# Configure Gunicorn's specific logs
 		self.error_log = root_logger
@@ -57,7 +67,9 @@ class UnifiedLogger(Logger):
 			backupCount=BACKUP_COUNT
 		)
 		access_handler.setFormatter(access_formatter)
-		self.access_log.addHandler(access_handler)
+		access_queue_handler = start_queue_logging(self.access_log.handlers + [access_handler], LOG_QUEUE_SIZE)
+		self.access_log.handlers = [access_queue_handler]
+		self.queue_handlers = [app_queue_handler, access_queue_handler]
 
 		# Suppress noisy loggers
 		for name in ['werkzeug', 'amulet', 'filelock']:
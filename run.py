@@ -1,38 +1,24 @@
 import logging
 import os
-import zipfile
-from datetime import datetime
-from app.config import LOG_DIR, LOG_FILE
+from app.config import LOG_DIR, APP_LOG, MAX_LOG_BYTES, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE
+from app.utils.compressed_rotating_handler import CompressedRotatingFileHandler
+from app.utils.log_pipeline import start_queue_logging
 from app import create_app
 
-def rotate_log_file():
-    old_log_path = os.path.join(LOG_DIR, LOG_FILE)
-    if os.path.exists(old_log_path):
-        mtime = os.path.getmtime(old_log_path)
-        ts_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d_%H-%M-%S')
-        zip_filename = os.path.join(LOG_DIR, f"log_{ts_str}.zip")
-
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(old_log_path, arcname=f"log_{ts_str}.log")
-        os.remove(old_log_path)
-
 # Clear old handlers
 for handler in logging.root.handlers[:]:
     logging.root.removeHandler(handler)
 
-# Ensure logs folder
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# Rotate
-rotate_log_file()
-
-# Configure new log file
-logging.basicConfig(
-    filename=os.path.join(LOG_DIR, LOG_FILE),
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
+# Rotates any previous log on startup; archives are compressed in the background
+file_handler = CompressedRotatingFileHandler(
+    os.path.join(LOG_DIR, APP_LOG),
+    maxBytes=MAX_LOG_BYTES,
+    backupCount=LOG_BACKUP_COUNT
 )
+file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+
+logging.root.addHandler(start_queue_logging([file_handler], LOG_QUEUE_SIZE))
+logging.root.setLevel(logging.DEBUG)
 
 app = create_app()
 